@@ -1,35 +1,38 @@
-import time
-import yaml
+import atexit
 import pandas as pd
 import streamlit as st
-import plotly.graph_objects as go
-from engine.trading_bot import TradingBot
+from engine.config import config
+from engine.trading_bot import TradingBot, HISTORY_COLUMNS
 from engine.stellar_api import fetch_exchange_data
-from engine.strategies import strategy_names, TradingStrategy
-
-# Load configuration from YAML file
-with open("config/config.yaml", "r") as config_file:
-    config = yaml.safe_load(config_file)
-
-# Initialize session state values if not already set
-for key, default in [("crypto_1", list(config["asset_issuers"].keys())[0]), 
-                     ("crypto_2", list(config["asset_issuers"].keys())[1]),
-                     ("interval", "1min"), 
-                     ("num_points", 50), 
-                     ("balances", None),
-                     ("algo_active", False),
-                     ("previous_stellar_key", ""),
-                     ("strategy_name", strategy_names[0])]:
-    if key not in st.session_state:
-        st.session_state[key] = default
-
-chart_layout_adjustments = {
-    "margin": dict(l=20, r=20, t=20, b=20),
-    "xaxis": {"title": "Time", "automargin": True, "rangeslider": {"visible": False}},
-    "yaxis": {"title": f"{st.session_state['crypto_1']}/{st.session_state['crypto_2']}", "automargin": True},
-    "yaxis2": {"title": "Volume", "overlaying": "y", "side": "right"},
-    "height": 300,
-    "showlegend": False
+from engine.candle_archive import load_candles, max_window
+from engine.charts import ChartState
+from engine.strategies import list_strategies, TradingStrategy
+from engine.scanner import MarketScanner
+from engine.portfolio import Portfolio
+from engine.journal import EventJournal
+from engine.asset_registry import get_registry
+from engine.utils import RateLimiter
+
+# Each panel reruns on its own: widget changes only rerun their panel, and panels
+# refresh on these cadences (seconds) from their own caches
+REFRESH_SECONDS = {
+    "balances": 30,
+    "history": 60,
+    "chart": 30,
+}
+# Chart windows on offer; windows beyond the live limit need archived candles
+CHART_POINTS = [30, 50, 100, 500, 1000, 5000, 10000, 20000, 50000]
+# Candles handed to the strategy when trading and scanning. Both page backward through
+# Horizon trades on every step, so this stays small; the chart window is set separately.
+MAX_TRADING_POINTS = 100
+INTERVAL_SECONDS = {
+    "1min": 60,
+    "2min": 120,
+    "5min": 300,
+    "15min": 900,
+    "1h": 3600,
+    "1d": 86400,
+    "1w": 604800
 }
 
 # Set page configuration
@@ -41,90 +44,131 @@ st.sidebar.title("Stellar Trading")
 
 network_choice = st.sidebar.selectbox("Select Network", ["Mainnet", "Testnet"])
 network_url = "https://horizon-testnet.stellar.org" if network_choice == "Testnet" else "https://horizon.stellar.org"
+network = network_choice.lower()
 
-stellar_key = st.sidebar.text_input("Enter Your Stellar Key (Private)", type="password")
-if stellar_key != st.session_state["previous_stellar_key"]:
-    st.session_state["previous_stellar_key"] = stellar_key
-    st.session_state["balances"] = None  # Reset balances when the key changes
-
+# Tradable assets of the selected network: config.yaml pins plus assets pinned in the registry
+available_cryptos = get_registry(network).asset_codes()
+if len(available_cryptos) < 2:
+    st.error(f"Pin at least one asset besides XLM for {network}: python -m engine assets --network {network} --pin CODE")
+    st.stop()
 
-trading_strategy = TradingStrategy(st.session_state["strategy_name"])
-
-# Initialize the TradingBot instance
-bot = TradingBot(stellar_key, network=network_choice.lower()) if stellar_key else None
-if stellar_key and bot:
-    with st.spinner("Fetching account balances..."):
-        balances = bot.get_balances()
-        st.session_state['balances'] = balances
+# Initialize session state values if not already set
+for key, default in [("crypto_1", available_cryptos[0]),
+                     ("crypto_2", available_cryptos[1]),
+                     ("interval", "1min"),
+                     ("num_points", 50),
+                     ("chart_points", 50),
+                     ("algo_active", False),
+                     ("strategy_name", list_strategies()[0]),
+                     ("chart_state", ChartState())]:
+    if key not in st.session_state:
+        st.session_state[key] = default
 
-# Trading History & Balance
-col1, col2 = st.columns([2, 1])
+stellar_key = st.sidebar.text_input("Enter Your Stellar Key (Private)", type="password")
 
-with col2:
-    st.subheader("Account")
 
+# Cached data sources shared by the panels
+@st.cache_resource(show_spinner=False)
+def get_journal():
+    # One writer per journal directory for the whole server process, closed when it exits
+    journal = EventJournal((config.get('journal') or {}).get('path', "data/journal"))
+    atexit.register(journal.close)
+    return journal
+
+@st.cache_resource(show_spinner=False)
+def get_bot(stellar_key, network):
+    # The account is loaded once per key and network instead of on every rerun
+    return TradingBot(stellar_key, network=network, journal=get_journal())
+
+@st.cache_data(ttl=REFRESH_SECONDS["balances"], show_spinner=False)
+def fetch_balances(stellar_key, network):
+    balances = get_bot(stellar_key, network).get_balances()
+    return balances if isinstance(balances, list) else []
+
+@st.cache_data(ttl=REFRESH_SECONDS["history"], show_spinner=False)
+def fetch_history(stellar_key, network):
+    return get_bot(stellar_key, network).fetch_trading_history()
+
+@st.cache_resource(show_spinner=False)
+def get_rate_limiter(network_url):
+    # One Horizon budget for the chart fetches of every session: 1 request per second
+    # sustained (the public Horizon limit), with short bursts for the usual small windows
+    return RateLimiter(1.0, burst=60)
+
+@st.cache_data(ttl=REFRESH_SECONDS["chart"], show_spinner=False)
+def fetch_candles(network_url, crypto_pair, interval, num_points):
+    return load_candles(crypto_pair=crypto_pair, interval=interval, num_points=num_points, network_url=network_url,
+                        rate_limiter=get_rate_limiter(network_url))
+
+def available_balance(asset_code):
+    for balance in fetch_balances(stellar_key, network):
+        if balance['Asset'] == asset_code:
+            return balance['Balance']
+    return None
+
+
+bot = None
+if stellar_key:
+    try:
+        with st.spinner("Loading account..."):
+            bot = get_bot(stellar_key, network)
+    except Exception as e:
+        st.sidebar.error(f"Could not load the account: {e}")
+
+
+@st.fragment(run_every=REFRESH_SECONDS["balances"])
+def balances_panel():
     st.write("**Balances**")
-    if stellar_key and st.session_state["balances"]:
+    if bot:
         with st.spinner("Fetching account balances..."):
-            balances = bot.get_balances()
-            st.session_state['balances'] = balances
-            st.dataframe(pd.DataFrame(balances), height=210, use_container_width=True)
+            balances = fetch_balances(stellar_key, network)
+        st.dataframe(pd.DataFrame(balances), height=210, use_container_width=True)
     else:
         st.write("Please enter your Stellar Key to proceed.")
 
+
+@st.fragment(run_every=REFRESH_SECONDS["history"])
+def history_panel():
     st.write("**Trading History**")
-    if stellar_key and bot:
-        trades = pd.DataFrame(columns=["Time", "Sell", "Buy", "Amount", "Price", "Total"])
-        # Uncomment when trading history functionality is enabled
+    if bot:
         with st.spinner("Fetching trading history..."):
-            trades = bot.fetch_trading_history()
+            trades = fetch_history(stellar_key, network)
 
-        if not trades.empty:
-            # Display trading history with fixed height and vertical scroll
-            st.dataframe(trades, height=350, use_container_width=True)
-        else:
+        if trades.empty:
             st.write("No trading history available for this account.")
-            st.dataframe(trades, height=350, use_container_width=True)
+            trades = pd.DataFrame(columns=HISTORY_COLUMNS)
+        # Display trading history with fixed height and vertical scroll
+        st.dataframe(trades, height=350, use_container_width=True)
     else:
         st.write("Please enter your Stellar Key to proceed.")
 
-# Crypto Charts
-with col1:
-    st.subheader("Exchange")
 
+@st.fragment(run_every=REFRESH_SECONDS["chart"])
+def chart_panel():
     col11, col12 = st.columns([1, 1])
-    
+
     with col11:
-        available_cryptos = list(config["asset_issuers"].keys())
         previous_crypto_1 = st.session_state["crypto_1"]
         st.session_state["crypto_1"] = st.selectbox("First Crypto", available_cryptos, index=0, label_visibility="hidden")
-        
+
         if previous_crypto_1 != st.session_state["crypto_1"]:
             available_cryptos_for_second = [crypto for crypto in available_cryptos if crypto != st.session_state["crypto_1"]]
             st.session_state["crypto_2"] = available_cryptos_for_second[0]
-        
-        if st.session_state['balances']:
-            balance_1 = None
-            for balance in st.session_state['balances']:
-                if balance['Asset'] == st.session_state["crypto_1"]:
-                    balance_1 = balance['Balance']
-            st.write(f"Available:  {balance_1} {st.session_state['crypto_1']}")
-    
+
+        if bot:
+            st.write(f"Available:  {available_balance(st.session_state['crypto_1'])} {st.session_state['crypto_1']}")
+
     with col12:
         available_cryptos_for_second = [crypto for crypto in available_cryptos if crypto != st.session_state["crypto_1"]]
         st.session_state["crypto_2"] = st.selectbox("Second Crypto", available_cryptos_for_second, index=0, label_visibility="hidden")
-        
-        if st.session_state['balances']:
-            balance_2 = None
-            for balance in st.session_state['balances']:
-                if balance['Asset'] == st.session_state["crypto_2"]:
-                    balance_2 = balance['Balance']
-            st.write(f"Available:  {balance_2} {st.session_state['crypto_2']}")
+
+        if bot:
+            st.write(f"Available:  {available_balance(st.session_state['crypto_2'])} {st.session_state['crypto_2']}")
 
     candlestick_tab, chart_tab = st.tabs(["Candlestick Chart", "Line Chart"])
-    
+
     _, col13, col14, _ = st.columns([1, 6, 2, 1])
-    
+
     with col13:
         time_intervals = ["1m", "2m", "5m", "15m", "1h", "1d", "1w"]
         selected_interval = st.radio("Interval of Time Points", time_intervals, horizontal=True)
@@ -137,110 +181,67 @@ with col1:
             "1d": "1d",
             "1w": "1w"
         }
+        previous_interval = st.session_state["interval"]
         st.session_state["interval"] = interval_mapping[selected_interval]
-    
+        if st.session_state["algo_active"] and previous_interval != st.session_state["interval"]:
+            # The trading timer's cadence is only set on a full rerun
+            st.rerun()
+
+    crypto_pair = f"{st.session_state['crypto_1']}/{st.session_state['crypto_2']}"
     with col14:
-        st.session_state["num_points"] = st.slider("Number of Time Points", min_value=30, max_value=100, value=50, step=10)
+        # Charts are downsampled, but only archived candles are cheap to load in bulk
+        chart_points = [points for points in CHART_POINTS if points <= max_window(crypto_pair, st.session_state["interval"])]
+        st.session_state["chart_points"] = st.select_slider("Number of Time Points", options=chart_points, value=50)
 
-    with st.spinner(f"Fetching {st.session_state['num_points']} * {st.session_state['interval']} data..."):
-        price_df = fetch_exchange_data(
-            network_url=network_url,
-            crypto_pair=f"{st.session_state['crypto_1']}/{st.session_state['crypto_2']}",
-            interval=st.session_state["interval"],
-            num_points=st.session_state["num_points"]
-        )
+    with st.spinner(f"Fetching {st.session_state['chart_points']} * {st.session_state['interval']} data..."):
+        price_df = fetch_candles(network_url, crypto_pair, st.session_state["interval"], st.session_state["chart_points"]).copy()
 
-    if st.session_state["strategy_name"]:
+    if st.session_state["strategy_name"] and not price_df.empty:
         # Apply the selected strategy
-        trading_strategy.strategy_name = st.session_state["strategy_name"]
-        price_df = trading_strategy.apply(price_df)
+        price_df = TradingStrategy(st.session_state["strategy_name"]).apply(price_df)
 
     if not price_df.empty:
         price_df['open'] = price_df['open'].interpolate(method='linear')
         price_df['close'] = price_df['close'].interpolate(method='linear')
 
-        with candlestick_tab:
-            fig_candle = go.Figure(data=[go.Candlestick(
-                x=price_df['timestamp'],
-                open=price_df['open'],
-                high=price_df['high'],
-                low=price_df['low'],
-                close=price_df['close']
-            )])
-            
-            # Add Buy and Sell markers
-            buy_signals = price_df[price_df['Signal'] == 'Buy']
-            sell_signals = price_df[price_df['Signal'] == 'Sell']
-            
-            fig_candle.add_trace(go.Scatter(
-                x=buy_signals['timestamp'],
-                y=buy_signals['low'],  # Place the marker at the lowest price of the candle
-                mode='markers',
-                name='Buy Signal',
-                marker=dict(symbol='triangle-up', color='blue', size=10)
-            ))
-
-            fig_candle.add_trace(go.Scatter(
-                x=sell_signals['timestamp'],
-                y=sell_signals['high'],  # Place the marker at the highest price of the candle
-                mode='markers',
-                name='Sell Signal',
-                marker=dict(symbol='triangle-down', color='magenta', size=10)
-            ))
-
-            if 'volume' in price_df.columns:
-                fig_candle.add_trace(go.Bar(x=price_df['timestamp'], y=price_df['volume'], name='Volume', yaxis='y2', opacity=0.3))
-            
-            fig_candle.update_layout(**chart_layout_adjustments)
-            st.plotly_chart(fig_candle, use_container_width=True)
+        # Only candles newer than the ones already charted are merged into the figures
+        chart_state = st.session_state["chart_state"]
+        chart_state.update(price_df, key=(crypto_pair, st.session_state["interval"], st.session_state["strategy_name"]))
+
+        chart_layout_adjustments = {
+            "margin": dict(l=20, r=20, t=20, b=20),
+            "xaxis": {"title": "Time", "automargin": True, "rangeslider": {"visible": False}},
+            "yaxis": {"title": crypto_pair, "automargin": True},
+            "yaxis2": {"title": "Volume", "overlaying": "y", "side": "right"},
+            "height": 300,
+            "showlegend": False
+        }
 
+        with candlestick_tab:
+            st.plotly_chart(chart_state.figure("candlestick", chart_layout_adjustments), use_container_width=True)
 
         with chart_tab:
-            fig_line = go.Figure()
-            
-            # Line chart showing price
-            fig_line.add_trace(go.Scatter(
-                x=price_df['timestamp'], 
-                y=(price_df['open'] + price_df['close']) / 2, 
-                mode='lines', 
-                name='Price'
-            ))
-            
-            # Add Buy and Sell markers
-            fig_line.add_trace(go.Scatter(
-                x=buy_signals['timestamp'],
-                y=buy_signals['close'],  # Place the marker on the closing price
-                mode='markers',
-                name='Buy Signal',
-                marker=dict(symbol='triangle-up', color='magenta', size=10)
-            ))
-
-            fig_line.add_trace(go.Scatter(
-                x=sell_signals['timestamp'],
-                y=sell_signals['close'],  # Place the marker on the closing price
-                mode='markers',
-                name='Sell Signal',
-                marker=dict(symbol='triangle-down', color='red', size=10)
-            ))
-
-            if 'volume' in price_df.columns:
-                fig_line.add_trace(go.Bar(x=price_df['timestamp'], y=price_df['volume'], name='Volume', yaxis='y2', opacity=0.3))
-            
-            fig_line.update_layout(**chart_layout_adjustments)
-            st.plotly_chart(fig_line, use_container_width=True)
+            st.plotly_chart(chart_state.figure("line", chart_layout_adjustments), use_container_width=True)
 
     else:
         st.write("No data available for the selected crypto pair.")
 
-    
-    # st.subheader("Trading Strategy")
+
+@st.fragment
+def strategy_panel():
     col15, _, col16 = st.columns([3, 1, 3], vertical_alignment="bottom")
     with col15:
-        st.session_state["strategy_name"] = st.selectbox("Trading Strategy", strategy_names, index=0)
+        strategy_name = st.selectbox("Trading Strategy", list_strategies(), index=0)
+        if strategy_name != st.session_state["strategy_name"]:
+            # The chart shows the strategy's signals, so it is the one change that reruns the page
+            st.session_state["strategy_name"] = strategy_name
+            st.rerun()
+        # Trading steps and the scanner read this on their next run
+        st.session_state["num_points"] = st.slider("Trading Window (Time Points)", min_value=30, max_value=MAX_TRADING_POINTS, value=50, step=10)
 
     with col16:
         # Toggleable trading control
-        if stellar_key:
+        if bot:
             if st.session_state["algo_active"]:
                 if st.button("Stop Bot Action", use_container_width=True):
                     st.session_state["algo_active"] = False
@@ -253,42 +254,94 @@ with col1:
                     st.rerun()
 
 
+# Trading History & Balance
+col1, col2 = st.columns([2, 1])
+
+with col2:
+    st.subheader("Account")
+    balances_panel()
+    history_panel()
+
+# Crypto Charts
+with col1:
+    st.subheader("Exchange")
+    chart_panel()
+    strategy_panel()
+
+
+# Market Scanner
+@st.cache_data(ttl=60, show_spinner=False)
+def scan_market(network_url, interval, num_points):
+    return MarketScanner(network_url, interval=interval, num_points=num_points).scan()
+
+@st.fragment
+def scanner_panel():
+    if st.toggle("Scan all pairs", key="scanner_active"):
+        with st.spinner(f"Scanning all pairs for {', '.join(list_strategies())} signals..."):
+            scan_table = scan_market(network_url, st.session_state["interval"], st.session_state["num_points"])
+        if not scan_table.empty:
+            st.dataframe(scan_table, height=350, use_container_width=True)
+        else:
+            st.write("No trades found for any pair.")
+
+with st.expander("Market Scanner"):
+    scanner_panel()
+
+
+# Portfolio
+@st.cache_resource(show_spinner=False)
+def load_portfolio(stellar_keys, network):
+    # Accounts are loaded once per set of keys instead of on every rerun
+    portfolio = Portfolio(list(stellar_keys), network=network)
+    portfolio.load()
+    return portfolio
+
+@st.fragment
+def portfolio_panel():
+    portfolio_keys = st.text_area("Stellar Keys (Private, one per line)", key="portfolio_keys")
+    stellar_keys = tuple(line.strip() for line in portfolio_keys.splitlines() if line.strip())
+    if stellar_keys:
+        try:
+            with st.spinner(f"Fetching {len(stellar_keys)} accounts..."):
+                portfolio = load_portfolio(stellar_keys, network)
+                snapshot = portfolio.snapshot()
+            st.write("**Balances**")
+            st.dataframe(portfolio.aggregate_balances(snapshot['balances']), use_container_width=True)
+            st.write("**Open Offers**")
+            st.dataframe(snapshot['offers'], use_container_width=True)
+            st.write("**Trading History**")
+            st.dataframe(snapshot['history'], height=350, use_container_width=True)
+        except Exception as e:
+            st.error(f"Could not load the portfolio: {e}")
+
+with st.expander("Portfolio"):
+    portfolio_panel()
+
+
 # Periodic trading logic
-if stellar_key and st.session_state["algo_active"]:
+if bot and st.session_state["algo_active"]:
+    # One trading step per interval, run by the frontend timer instead of a blocking loop
+    @st.fragment(run_every=INTERVAL_SECONDS.get(st.session_state["interval"], 60))  # Default to 1 minute
     def periodic_trading():
-        interval_seconds = {
-            "1min": 60,
-            "2min": 120,
-            "5min": 300,
-            "15min": 900,
-            "1h": 3600,
-            "1d": 86400,
-            "1w": 604800
-        }
-        trade_interval = interval_seconds.get(st.session_state["interval"], 60)  # Default to 1 minute
-
-        while st.session_state["algo_active"]:
-            try:
-                price_df = fetch_exchange_data(
-                    network_url=network_url,
-                    crypto_pair=f"{st.session_state['crypto_1']}/{st.session_state['crypto_2']}",
-                    interval=st.session_state["interval"],
-                    num_points=st.session_state["num_points"]
-                )
-                balances = bot.get_balances()
-                bot.do_exchange(
-                    base_asset_code=st.session_state['crypto_1'],
-                    counter_asset_code=st.session_state['crypto_2'],
-                    price_df=price_df,
-                    balances=balances,
-                    trading_strategy=trading_strategy
-                )
-            except Exception as e:
-                st.error(f"An error occurred: {e}")
-            time.sleep(trade_interval)
-    while True:
-        periodic_trading()
-    # # Run periodic trading in a separate thread
-    # if 'trading_thread' not in st.session_state:
-    #     st.session_state['trading_thread'] = threading.Thread(target=periodic_trading, daemon=True)
-    #     st.session_state['trading_thread'].start()
+        try:
+            price_df = fetch_exchange_data(
+                network_url=network_url,
+                crypto_pair=f"{st.session_state['crypto_1']}/{st.session_state['crypto_2']}",
+                interval=st.session_state["interval"],
+                num_points=st.session_state["num_points"]
+            )
+            balances = bot.get_balances()
+            bot.do_exchange(
+                base_asset_code=st.session_state['crypto_1'],
+                counter_asset_code=st.session_state['crypto_2'],
+                price_df=price_df,
+                balances=balances,
+                trading_strategy=TradingStrategy(st.session_state["strategy_name"])
+            )
+            # Orders change balances and history, so their panels refetch on the next refresh
+            fetch_balances.clear()
+            fetch_history.clear()
+        except Exception as e:
+            st.error(f"An error occurred: {e}")
+
+    periodic_trading()
@@ -0,0 +1,393 @@
+import os
+import time
+import sqlite3
+import logging
+import argparse
+import functools
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from engine.config import config
+from engine.utils import RateLimiter, lazy_import
+
+# Heavy dependencies are imported on first use to keep engine imports fast
+stellar_sdk = lazy_import("stellar_sdk")
+
+# Set up logging configuration
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+PAGE_LIMIT = 200  # Horizon API limit per request
+HORIZON_URLS = {
+    "testnet": "https://horizon-testnet.stellar.org",
+    "mainnet": "https://horizon.stellar.org",
+}
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS assets (
+    code TEXT NOT NULL,
+    issuer TEXT NOT NULL,
+    holders INTEGER NOT NULL,
+    amount REAL NOT NULL,
+    home_domain TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (code, issuer)
+);
+CREATE INDEX IF NOT EXISTS assets_by_code ON assets (code, holders DESC);
+CREATE INDEX IF NOT EXISTS assets_by_issuer ON assets (issuer);
+CREATE INDEX IF NOT EXISTS assets_by_holders ON assets (holders DESC);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pins (
+    code TEXT PRIMARY KEY,
+    issuer TEXT NOT NULL,
+    pinned_at REAL NOT NULL
+);
+"""
+
+
+@functools.lru_cache(maxsize=None)
+def build_asset(asset_code, asset_issuer=None):
+    """
+    Memoized stellar_sdk Asset constructor (Asset validates the issuer key on every construction).
+    """
+    if asset_code == "XLM" and asset_issuer in (None, "native", "Stellar Foundation"):
+        return stellar_sdk.Asset.native()
+    return stellar_sdk.Asset(asset_code, asset_issuer)
+
+
+def network_for_url(network_url):
+    """
+    Network name ("mainnet", "testnet") of a Horizon URL; unknown URLs count as mainnet.
+    """
+    return next((network for network, url in HORIZON_URLS.items() if url == network_url.rstrip('/')), "mainnet")
+
+
+def parse_asset_record(record):
+    """
+    Convert a Horizon /assets record into a catalog row.
+    """
+    accounts = record.get('accounts') or {}
+    balances = record.get('balances') or {}
+    holders = accounts.get('authorized', record.get('num_accounts', 0))
+    amount = balances.get('authorized', record.get('amount', 0))
+    home_domain = ((record.get('_links') or {}).get('toml') or {}).get('href', '') or None
+    if home_domain:
+        home_domain = home_domain.split('//')[-1].split('/')[0] or None
+    return (record['asset_code'], record['asset_issuer'], int(holders), float(amount), home_domain)
+
+
+class AssetRegistry:
+    """
+    Local catalog of the Stellar assets of one network, indexed by code, issuer and holder count.
+
+    The catalog is an SQLite file filled by crawling Horizon's /assets endpoint page by page
+    (resumable through a stored cursor) and refreshed once it is older than `ttl` seconds.
+
+    Tradable assets are XLM and the pinned ones: issuers pinned in config.yaml (`asset_issuers`
+    for mainnet, `<network>_asset_issuers` for other networks) and issuers pinned in the
+    catalog with pin(). Pins take precedence over the catalog; for other codes market data
+    uses the issuer with the most holders, but orders are only placed for pinned issuers.
+
+    Parameters:
+    - path: SQLite catalog file
+    - network: "mainnet" or "testnet"
+    - network_url: URL of the Stellar Horizon API (defaults to the network's public Horizon)
+    - ttl: Age in seconds after which refresh() recrawls the catalog
+    - requests_per_second: Horizon request budget for crawls and lookups (public Horizon allows 1);
+      rate-limited and failed requests are retried with backoff
+    """
+    def __init__(self, path="data/assets.sqlite", network="mainnet", network_url=None, ttl=86400, requests_per_second=1.0):
+        self.path = path
+        self.network = network
+        self.network_url = network_url or HORIZON_URLS[network]
+        self.ttl = ttl
+        self.rate_limiter = RateLimiter(requests_per_second)
+        self._server = None
+        self._issuers = {}
+        self._pins = None
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    @property
+    def server(self):
+        if self._server is None:
+            self._server = stellar_sdk.Server(self.network_url)
+        return self._server
+
+    @contextmanager
+    def _connect(self):
+        # The catalog file is only created once it is actually used
+        if not self._initialized:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        connection = sqlite3.connect(self.path)
+        try:
+            with connection:
+                if not self._initialized:
+                    connection.executescript(SCHEMA)
+                    self._initialized = True
+                yield connection
+        finally:
+            connection.close()
+
+    def _meta(self, key, default=None):
+        with self._connect() as connection:
+            row = connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, connection, key, value):
+        if value is None:
+            connection.execute("DELETE FROM meta WHERE key = ?", (key,))
+        else:
+            connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def _store(self, connection, records):
+        now = time.time()
+        connection.executemany(
+            "INSERT OR REPLACE INTO assets (code, issuer, holders, amount, home_domain, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+            [(*parse_asset_record(record), now) for record in records if record.get('asset_type') != 'native'],
+        )
+        with self._lock:
+            self._issuers.clear()
+
+    def is_stale(self):
+        last_refreshed = self._meta('last_refreshed')
+        return last_refreshed is None or time.time() - float(last_refreshed) > self.ttl
+
+    def refresh(self, force=False):
+        """
+        Crawl every asset from Horizon into the catalog if it is stale (or force is set).
+
+        Each page is committed together with the cursor of the next one, so an interrupted
+        crawl continues where it stopped.
+
+        Returns:
+        - Number of asset records stored
+        """
+        if not force and not self.is_stale():
+            return 0
+
+        cursor = self._meta('crawl_cursor')
+        stored = 0
+        while True:
+            request = self.server.assets().limit(PAGE_LIMIT).order(desc=False)
+            if cursor:
+                request = request.cursor(cursor)
+            records = self.rate_limiter.call(request.call)['_embedded']['records']
+
+            with self._connect() as connection:
+                self._store(connection, records)
+                cursor = records[-1]['paging_token'] if records else cursor
+                finished = len(records) < PAGE_LIMIT
+                self._set_meta(connection, 'crawl_cursor', None if finished else cursor)
+                if finished:
+                    self._set_meta(connection, 'last_refreshed', time.time())
+            stored += len(records)
+
+            if finished:
+                logging.info(f"Asset catalog refreshed with {stored} assets.")
+                return stored
+
+    def discover(self, asset_codes, max_workers=8):
+        """
+        Look up specific asset codes on Horizon concurrently and add them to the catalog.
+
+        Returns:
+        - Dict mapping each code to the number of issuers found
+        """
+        def fetch(asset_code):
+            records, cursor = [], None
+            while True:
+                request = self.server.assets().for_code(asset_code).limit(PAGE_LIMIT)
+                if cursor:
+                    request = request.cursor(cursor)
+                page = self.rate_limiter.call(request.call)['_embedded']['records']
+                records.extend(page)
+                if len(page) < PAGE_LIMIT:
+                    return records
+                cursor = page[-1]['paging_token']
+
+        found = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(fetch, asset_code): asset_code for asset_code in set(asset_codes)}
+            for future in as_completed(futures):
+                asset_code = futures[future]
+                try:
+                    records = future.result()
+                except Exception as e:
+                    logging.error(f"Error discovering asset {asset_code}: {e}")
+                    continue
+                with self._connect() as connection:
+                    self._store(connection, records)
+                found[asset_code] = len(records)
+        return found
+
+    def lookup(self, asset_code=None, asset_issuer=None, min_holders=0, limit=20):
+        """
+        Query the catalog, most held assets first.
+
+        Returns:
+        - List of dicts with code, issuer, holders, amount and home_domain
+        """
+        clauses, params = ["holders >= ?"], [min_holders]
+        if asset_code:
+            clauses.append("code = ?")
+            params.append(asset_code)
+        if asset_issuer:
+            clauses.append("issuer = ?")
+            params.append(asset_issuer)
+        query = f"SELECT code, issuer, holders, amount, home_domain FROM assets WHERE {' AND '.join(clauses)} ORDER BY holders DESC LIMIT ?"
+        with self._connect() as connection:
+            rows = connection.execute(query, (*params, limit)).fetchall()
+        return [dict(zip(("code", "issuer", "holders", "amount", "home_domain"), row)) for row in rows]
+
+    def pinned_issuers(self):
+        """
+        Issuers of the tradable assets, config.yaml pins first, as {code: issuer} (None for XLM).
+        """
+        with self._lock:
+            if self._pins is None:
+                # Reading pins must not create a catalog that was never used
+                self._pins = {}
+                if os.path.exists(self.path):
+                    with self._connect() as connection:
+                        self._pins = dict(connection.execute("SELECT code, issuer FROM pins ORDER BY pinned_at").fetchall())
+            stored = dict(self._pins)
+
+        config_key = 'asset_issuers' if self.network == "mainnet" else f'{self.network}_asset_issuers'
+        pinned = {"XLM": None}
+        pinned.update({code: issuer for code, issuer in (config.get(config_key) or {}).items() if code != "XLM"})
+        for code, issuer in stored.items():
+            pinned.setdefault(code, issuer)
+        return pinned
+
+    def asset_codes(self):
+        """
+        Codes of the tradable assets, for pair selectors, balances and scans.
+        """
+        return list(self.pinned_issuers())
+
+    def pin(self, asset_code, asset_issuer=None):
+        """
+        Make an asset tradable by pinning its issuer in the catalog.
+
+        Parameters:
+        - asset_code: Asset code
+        - asset_issuer: Issuer to pin (defaults to the most held catalog entry, discovered if unknown)
+
+        Returns:
+        - The pinned issuer
+        """
+        if asset_issuer is None:
+            asset_issuer = self.resolve_issuer(asset_code, pinned=False)
+            if asset_issuer is None:
+                raise ValueError(f"Unknown asset: {asset_code}")
+        build_asset(asset_code, asset_issuer)  # Validates the issuer key
+        with self._connect() as connection:
+            connection.execute("INSERT OR REPLACE INTO pins (code, issuer, pinned_at) VALUES (?, ?, ?)", (asset_code, asset_issuer, time.time()))
+        with self._lock:
+            self._pins = None
+            self._issuers.pop(asset_code, None)
+        return asset_issuer
+
+    def trading_asset(self, asset_code, asset_issuer=None):
+        """
+        Asset to sign an order for: an explicitly given issuer or else a pinned one. Codes
+        without a pin are refused rather than resolved by holder count, which a spoofed asset
+        with the same code could win.
+        """
+        if asset_issuer is not None:
+            return build_asset(asset_code, asset_issuer)
+        pinned = self.pinned_issuers()
+        if asset_code not in pinned:
+            raise ValueError(f"{asset_code} has no pinned issuer on {self.network}. Pin it with "
+                             f"'python -m engine assets --network {self.network} --pin {asset_code}' or pass its issuer.")
+        return build_asset(asset_code, pinned[asset_code])
+
+    def resolve_issuer(self, asset_code, discover=True, pinned=True):
+        """
+        Issuer to use for an asset code: the pinned one, else the most held catalog entry.
+        Unknown codes are discovered on Horizon once and cached in the catalog.
+        """
+        if asset_code == "XLM":
+            return None
+        if pinned:
+            pinned_issuer = self.pinned_issuers().get(asset_code)
+            if pinned_issuer:
+                return pinned_issuer
+
+        with self._lock:
+            if asset_code in self._issuers:
+                return self._issuers[asset_code]
+        matches = self.lookup(asset_code, limit=1)
+        if not matches and discover:
+            self.discover([asset_code])
+            matches = self.lookup(asset_code, limit=1)
+        issuer = matches[0]['issuer'] if matches else None
+        with self._lock:
+            self._issuers[asset_code] = issuer
+        return issuer
+
+    def get_asset(self, asset_code, discover=True):
+        """
+        Memoized stellar_sdk Asset for an asset code.
+        """
+        if asset_code == "XLM":
+            return build_asset("XLM")
+        issuer = self.resolve_issuer(asset_code, discover=discover)
+        if issuer is None:
+            raise ValueError(f"Unknown asset: {asset_code}")
+        return build_asset(asset_code, issuer)
+
+
+_registries = {}
+_registry_lock = threading.Lock()
+
+
+def get_registry(network="mainnet"):
+    """
+    Shared AssetRegistry of a network, created on first use at the path configured under
+    asset_registry.path in config.yaml (data/assets.sqlite by default). Catalogs of networks
+    other than mainnet get the network name appended (data/assets-testnet.sqlite).
+    """
+    if network not in _registries:
+        if network not in HORIZON_URLS:
+            raise ValueError("Unsupported network. Please choose 'testnet' or 'mainnet'.")
+        with _registry_lock:
+            if network not in _registries:
+                settings = config.get('asset_registry') or {}
+                path = settings.get('path', "data/assets.sqlite")
+                if network != "mainnet":
+                    root, extension = os.path.splitext(path)
+                    path = f"{root}-{network}{extension}"
+                _registries[network] = AssetRegistry(path=path, network=network, ttl=settings.get('ttl', 86400))
+    return _registries[network]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the local Stellar asset catalog.")
+    parser.add_argument("--db", default=None, help="Catalog file (defaults to the shared registry)")
+    parser.add_argument("--network", default="mainnet", choices=list(HORIZON_URLS))
+    parser.add_argument("--refresh", action="store_true", help="Crawl /assets if the catalog is stale")
+    parser.add_argument("--force", action="store_true", help="Crawl /assets even if the catalog is fresh")
+    parser.add_argument("--discover", nargs="*", default=[], help="Asset codes to look up on Horizon")
+    parser.add_argument("--lookup", nargs="*", default=[], help="Asset codes to print from the catalog")
+    parser.add_argument("--pin", nargs="*", default=[], help="Make assets tradable: CODE (most held issuer) or CODE:ISSUER")
+    args = parser.parse_args(argv)
+
+    registry = AssetRegistry(args.db, network=args.network) if args.db else get_registry(args.network)
+    if args.refresh or args.force:
+        registry.refresh(force=args.force)
+    if args.discover:
+        registry.discover(args.discover)
+    for asset in args.pin:
+        asset_code, _, asset_issuer = asset.partition(':')
+        logging.info(f"Pinned {asset_code} to issuer {registry.pin(asset_code, asset_issuer or None)}.")
+    for asset_code in args.lookup:
+        for entry in registry.lookup(asset_code, limit=5):
+            print(f"{entry['code']:<12} {entry['issuer']} holders={entry['holders']} domain={entry['home_domain'] or '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+import os
+import argparse
+import logging
+import itertools
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import pytz
+from engine.asset_registry import get_registry, network_for_url
+from engine.stellar_api import get_asset, parse_trade
+from engine.utils import RateLimiter, lazy_import
+
+# Heavy dependencies are imported on first use to keep engine imports fast
+pd = lazy_import("pandas")
+stellar_sdk = lazy_import("stellar_sdk")
+stellar_sdk_exceptions = lazy_import("stellar_sdk.exceptions")
+
+# Set up logging configuration
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+TRADE_COLUMNS = ['timestamp', 'price', 'amount', 'volume', 'paging_token']
+PAGE_LIMIT = 200  # Horizon API limit per request
+SHARD_TIME_FORMAT = "%Y%m%dT%H%M%S"
+
+
+def _parse_time(value):
+    return datetime.strptime(value, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=pytz.utc)
+
+
+def ledger_from_paging_token(paging_token):
+    """
+    Extract the ledger sequence from a trade paging token ("<operation id>-<index>").
+    Operation ids are TOIDs, which keep the ledger sequence in their upper 32 bits.
+    """
+    return int(paging_token.split('-')[0]) >> 32
+
+
+def ledger_cursor(ledger_sequence):
+    """
+    Build a trades cursor positioned just before the first operation of a ledger.
+    """
+    return f"{ledger_sequence << 32}-0"
+
+
+def _ledger_close_time(server, sequence, rate_limiter):
+    try:
+        ledger = rate_limiter.call(server.ledgers().ledger(sequence).call)
+    except stellar_sdk_exceptions.NotFoundError:
+        # Ledgers outside the Horizon retention window are treated as older than any target time
+        return None
+    return _parse_time(ledger['closed_at'])
+
+
+def find_ledger_at(server, when, rate_limiter, latest=None):
+    """
+    Find the first ledger that closed at or after a given time.
+
+    Ledger close times grow almost linearly, so the search interpolates between the
+    bracketing ledgers and only falls back to bisection when an estimate is poor.
+
+    Parameters:
+    - server: stellar_sdk Server
+    - when: Timezone-aware datetime to locate
+    - rate_limiter: RateLimiter shared with the download workers
+    - latest: Optional (sequence, close_time) of the newest ledger to avoid refetching it
+
+    Returns:
+    - Ledger sequence number
+    """
+    if latest is None:
+        record = rate_limiter.call(server.ledgers().order(desc=True).limit(1).call)['_embedded']['records'][0]
+        latest = (record['sequence'], _parse_time(record['closed_at']))
+
+    hi, hi_time = latest
+    if when > hi_time:
+        return hi + 1
+
+    lo, lo_time = 1, None
+    bisect = False
+    while hi - lo > 1:
+        if lo_time is None and lo == 1:
+            # Without a lower time bound, estimate from the average ledger close time (~5s)
+            estimate = hi - int((hi_time - when).total_seconds() / 5)
+        elif bisect or lo_time is None:
+            estimate = (lo + hi) // 2
+        else:
+            span = (hi_time - lo_time).total_seconds()
+            estimate = lo + int((when - lo_time).total_seconds() / span * (hi - lo)) if span > 0 else (lo + hi) // 2
+        guess = min(max(estimate, lo + 1), hi - 1)
+
+        close_time = _ledger_close_time(server, guess, rate_limiter)
+        previous_width = hi - lo
+        if close_time is not None and close_time >= when:
+            hi, hi_time = guess, close_time
+        else:
+            lo, lo_time = guess, close_time
+        # Bisect next round if interpolation failed to halve the bracket
+        bisect = (hi - lo) * 2 > previous_width
+
+    return hi
+
+
+def split_time_range(start_time, end_time, shard_duration):
+    """
+    Split [start_time, end_time) into consecutive shards of at most shard_duration.
+    """
+    shards = []
+    shard_start = start_time
+    while shard_start < end_time:
+        shard_end = min(shard_start + shard_duration, end_time)
+        shards.append((shard_start, shard_end))
+        shard_start = shard_end
+    return shards
+
+
+def shard_path(out_dir, crypto_pair, shard_start, shard_end):
+    base_asset_code, counter_asset_code = crypto_pair.split('/')
+    file_name = f"{shard_start.strftime(SHARD_TIME_FORMAT)}_{shard_end.strftime(SHARD_TIME_FORMAT)}.parquet"
+    return os.path.join(out_dir, f"{base_asset_code}_{counter_asset_code}", file_name)
+
+
+def fetch_shard(server, crypto_pair, start_ledger, end_ledger, rate_limiter, network="mainnet"):
+    """
+    Download every trade of a pair executed in ledgers [start_ledger, end_ledger).
+
+    Returns:
+    - DataFrame with TRADE_COLUMNS
+    """
+    base_asset_code, counter_asset_code = crypto_pair.split('/')
+    base_asset = get_asset(base_asset_code, network)
+    counter_asset = get_asset(counter_asset_code, network)
+
+    trade_data = []
+    cursor = ledger_cursor(start_ledger)
+    while True:
+        records = rate_limiter.call(
+            server.trades()
+            .for_asset_pair(base=base_asset, counter=counter_asset)
+            .order(desc=False)
+            .limit(PAGE_LIMIT)
+            .cursor(cursor)
+            .call
+        )['_embedded']['records']
+
+        for trade in records:
+            if ledger_from_paging_token(trade['paging_token']) >= end_ledger:
+                return pd.DataFrame(trade_data, columns=TRADE_COLUMNS)
+            record = parse_trade(trade)
+            record['paging_token'] = trade['paging_token']
+            trade_data.append(record)
+
+        if len(records) < PAGE_LIMIT:
+            return pd.DataFrame(trade_data, columns=TRADE_COLUMNS)
+        cursor = records[-1]['paging_token']
+
+
+def _write_shard(trade_df, path):
+    # Write to a temporary file first so an interrupted run never leaves a partial shard behind
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    trade_df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def default_pairs(network="mainnet"):
+    """
+    Every unordered pair of the tradable assets of the network's asset registry.
+    """
+    assets = get_registry(network).asset_codes()
+    return [f"{base}/{counter}" for base, counter in itertools.combinations(assets, 2)]
+
+
+def backfill(start_time,
+             end_time,
+             out_dir="data/trades",
+             crypto_pairs=None,
+             network_url="https://horizon.stellar.org",
+             shard_duration=timedelta(hours=6),
+             max_workers=8,
+             requests_per_second=1.0):
+    """
+    Download historical trades for several pairs concurrently, one Parquet file per time shard.
+
+    Shards that already exist on disk are skipped, so an interrupted backfill can simply be
+    rerun with the same start_time to resume or extend it. A trailing shard that is shorter than
+    shard_duration or has not closed yet is left for a later run.
+
+    Parameters:
+    - start_time, end_time: Timezone-aware datetimes bounding the range
+    - out_dir: Directory receiving "<BASE>_<COUNTER>/<start>_<end>.parquet" shard files
+    - crypto_pairs: List of "BASE/QUOTE" pairs (defaults to every pair of the tradable assets)
+    - network_url: URL of the Stellar Horizon API
+    - shard_duration: timedelta covered by each shard
+    - max_workers: Number of concurrent download threads
+    - requests_per_second: Global Horizon request budget shared by all workers (public Horizon
+      allows 3600 requests per hour); rate-limited and failed requests are retried with backoff
+
+    Returns:
+    - Dict mapping shard paths to the number of trades written (existing shards are not listed)
+    """
+    server = stellar_sdk.Server(network_url)
+    network = network_for_url(network_url)
+    rate_limiter = RateLimiter(requests_per_second)
+    crypto_pairs = crypto_pairs or default_pairs(network)
+    latest_record = rate_limiter.call(server.ledgers().order(desc=True).limit(1).call)['_embedded']['records'][0]
+    latest = (latest_record['sequence'], _parse_time(latest_record['closed_at']))
+
+    # Only whole shards on the grid anchored at start_time that have already closed are written,
+    # so a rerun with a later end_time extends the range without overlapping a partial shard
+    shards = [
+        (shard_start, shard_end)
+        for shard_start, shard_end in split_time_range(start_time, end_time, shard_duration)
+        if shard_end - shard_start == shard_duration and shard_end <= latest[1]
+    ]
+
+    pending = [
+        (crypto_pair, shard_start, shard_end)
+        for crypto_pair in crypto_pairs
+        for shard_start, shard_end in shards
+        if not os.path.exists(shard_path(out_dir, crypto_pair, shard_start, shard_end))
+    ]
+    logging.info(f"Backfill: {len(pending)} of {len(crypto_pairs) * len(shards)} shards left to download.")
+    if not pending:
+        return {}
+
+    # Shard boundaries are shared by every pair, so each boundary ledger is resolved only once
+    boundary_times = sorted({shard_start for _, shard_start, _ in pending} | {shard_end for _, _, shard_end in pending})
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        boundary_futures = {
+            executor.submit(find_ledger_at, server, boundary_time, rate_limiter, latest): boundary_time
+            for boundary_time in boundary_times
+        }
+        boundary_ledgers = {}
+        for future in as_completed(boundary_futures):
+            try:
+                boundary_ledgers[boundary_futures[future]] = future.result()
+            except Exception as e:
+                logging.error(f"Error locating the ledger at {boundary_futures[future]}: {e}")
+
+        # Shards whose boundaries could not be located are left for the next run
+        located = [shard for shard in pending if shard[1] in boundary_ledgers and shard[2] in boundary_ledgers]
+        if len(located) < len(pending):
+            logging.error(f"Skipping {len(pending) - len(located)} shards with unknown boundary ledgers.")
+
+        def download(crypto_pair, shard_start, shard_end):
+            trade_df = fetch_shard(server, crypto_pair, boundary_ledgers[shard_start], boundary_ledgers[shard_end], rate_limiter, network)
+            path = shard_path(out_dir, crypto_pair, shard_start, shard_end)
+            _write_shard(trade_df, path)
+            return path, len(trade_df)
+
+        shard_futures = {executor.submit(download, *shard): shard for shard in located}
+        written = {}
+        for future in as_completed(shard_futures):
+            crypto_pair, shard_start, shard_end = shard_futures[future]
+            try:
+                path, count = future.result()
+                written[path] = count
+                logging.info(f"Backfilled {count} trades for {crypto_pair} {shard_start} - {shard_end}.")
+            except Exception as e:
+                logging.error(f"Error backfilling {crypto_pair} {shard_start} - {shard_end}: {e}")
+
+    return written
+
+
+def _to_utc(value):
+    if value is None:
+        return None
+    timestamp = pd.Timestamp(value)
+    return timestamp.tz_localize('UTC') if timestamp.tzinfo is None else timestamp.tz_convert('UTC')
+
+
+def load_trades(out_dir, crypto_pair, start_time=None, end_time=None):
+    """
+    Load backfilled trades of a pair from its shard files.
+
+    Parameters:
+    - out_dir: Backfill output directory
+    - crypto_pair: Trading pair in the format "BASE/QUOTE"
+    - start_time, end_time: Optional bounds (datetimes or strings; naive means UTC)
+
+    Returns:
+    - DataFrame with TRADE_COLUMNS sorted by timestamp, each trade once
+    """
+    base_asset_code, counter_asset_code = crypto_pair.split('/')
+    pair_dir = os.path.join(out_dir, f"{base_asset_code}_{counter_asset_code}")
+    start_time = _to_utc(start_time)
+    end_time = _to_utc(end_time)
+    if not os.path.isdir(pair_dir):
+        return pd.DataFrame(columns=TRADE_COLUMNS)
+
+    frames = []
+    for file_name in sorted(os.listdir(pair_dir)):
+        if not file_name.endswith('.parquet'):
+            continue
+        shard_start, shard_end = (
+            datetime.strptime(part, SHARD_TIME_FORMAT).replace(tzinfo=pytz.utc)
+            for part in file_name[:-len('.parquet')].split('_')
+        )
+        if (start_time and shard_end <= start_time) or (end_time and shard_start >= end_time):
+            continue
+        frames.append(pd.read_parquet(os.path.join(pair_dir, file_name)))
+
+    if not frames:
+        return pd.DataFrame(columns=TRADE_COLUMNS)
+
+    # Shards written by older runs may overlap, the paging token identifies a trade
+    trade_df = pd.concat(frames, ignore_index=True).drop_duplicates('paging_token').sort_values('timestamp', kind='stable')
+    if start_time:
+        trade_df = trade_df[trade_df['timestamp'] >= start_time]
+    if end_time:
+        trade_df = trade_df[trade_df['timestamp'] < end_time]
+    return trade_df.reset_index(drop=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backfill historical Stellar trades into Parquet shards.")
+    parser.add_argument("--start", required=True, help="Start date, e.g. 2024-01-01 or 2024-01-01T12:00:00")
+    parser.add_argument("--end", default=None, help="End date (defaults to now, the unfinished last shard is left for a later run)")
+    parser.add_argument("--pairs", nargs="*", default=None, help="Pairs such as XLM/USDC (defaults to all tradable pairs)")
+    parser.add_argument("--out", default="data/trades", help="Output directory")
+    parser.add_argument("--network-url", default="https://horizon.stellar.org")
+    parser.add_argument("--shard-hours", type=float, default=6)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=1.0, help="Maximum Horizon requests per second (public Horizon allows 1)")
+    args = parser.parse_args(argv)
+
+    start_time = datetime.fromisoformat(args.start).replace(tzinfo=pytz.utc)
+    end_time = datetime.fromisoformat(args.end).replace(tzinfo=pytz.utc) if args.end else datetime.now(pytz.utc)
+
+    backfill(
+        start_time,
+        end_time,
+        out_dir=args.out,
+        crypto_pairs=args.pairs,
+        network_url=args.network_url,
+        shard_duration=timedelta(hours=args.shard_hours),
+        max_workers=args.workers,
+        requests_per_second=args.rate,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+import os
+import argparse
+import logging
+from engine.stellar_api import fetch_exchange_data, trades_to_ohlc
+from engine.utils import lazy_import
+
+# Heavy dependencies are imported on first use to keep engine imports fast
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# Set up logging configuration
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+CANDLE_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+INDEX_STRIDE = 1024  # One sparse index entry per this many candles
+MAX_LIVE_POINTS = 1000  # Most candles a chart window may page through Horizon for
+
+
+class CandleSlice:
+    """
+    A time range of archived candles. Every column is a read-only view on the memory-mapped
+    archive files, so slicing never copies or parses data.
+    """
+    def __init__(self, timestamp, columns):
+        self.timestamp = timestamp  # int64 nanoseconds since epoch (UTC)
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.timestamp)
+
+    def __getitem__(self, column):
+        if column == 'timestamp':
+            return self.timestamp
+        return self.columns[column]
+
+    def to_frame(self):
+        """
+        Copy the slice into a DataFrame shaped like fetch_exchange_data's output.
+        """
+        price_df = pd.DataFrame({column: np.array(values) for column, values in self.columns.items()})
+        price_df.insert(0, 'timestamp', pd.to_datetime(np.array(self.timestamp), unit='ns', utc=True))
+        return price_df
+
+
+class CandleArchive:
+    """
+    Append-only on-disk candle store, one directory per pair and interval.
+
+    Each column lives in its own flat little-endian binary file (timestamp.i8, open.f8, ...)
+    alongside index.i8, a sparse index holding every INDEX_STRIDE-th timestamp. Readers
+    memory-map the files, so processes reading the same archive (UI, daemon, backtests)
+    share pages through the OS cache.
+
+    Appends write the timestamp column last and readers size themselves from it, so a
+    reader never observes a partially written candle. Only one writer per pair and
+    interval is supported.
+    """
+    def __init__(self, root="data/candles"):
+        self.root = root
+        self._maps = {}
+
+    def _path(self, crypto_pair, interval):
+        base_asset_code, counter_asset_code = crypto_pair.split('/')
+        return os.path.join(self.root, f"{base_asset_code}_{counter_asset_code}", interval)
+
+    @staticmethod
+    def _column_file(path, column):
+        return os.path.join(path, f"{column}.i8" if column in ('timestamp', 'index') else f"{column}.f8")
+
+    def series(self):
+        """
+        Yield (crypto_pair, interval) for every series stored in the archive.
+        """
+        if not os.path.isdir(self.root):
+            return
+        for pair_dir in sorted(os.listdir(self.root)):
+            for interval in sorted(os.listdir(os.path.join(self.root, pair_dir))):
+                yield pair_dir.replace('_', '/', 1), interval
+
+    def count(self, crypto_pair, interval):
+        """
+        Number of complete candles stored for a pair and interval.
+        """
+        timestamp_file = self._column_file(self._path(crypto_pair, interval), 'timestamp')
+        return os.path.getsize(timestamp_file) // 8 if os.path.exists(timestamp_file) else 0
+
+    def _map(self, path, column, dtype, rows):
+        # Reuse the mapping while the file has not grown past it
+        key = (path, column)
+        cached = self._maps.get(key)
+        if cached is None or len(cached) < rows:
+            cached = np.memmap(self._column_file(path, column), dtype=dtype, mode='r')
+            self._maps[key] = cached
+        return cached[:rows]
+
+    def _truncate(self, path, column, rows):
+        column_file = self._column_file(path, column)
+        if os.path.exists(column_file) and os.path.getsize(column_file) > rows * 8:
+            os.truncate(column_file, rows * 8)
+
+    def last_timestamp(self, crypto_pair, interval):
+        """
+        Timestamp (ns since epoch) of the newest archived candle, or None if the series is empty.
+        """
+        rows = self.count(crypto_pair, interval)
+        if rows == 0:
+            return None
+        return int(self._map(self._path(crypto_pair, interval), 'timestamp', '<i8', rows)[-1])
+
+    def append(self, crypto_pair, interval, ohlc_df):
+        """
+        Append candles newer than the last archived one.
+
+        Parameters:
+        - crypto_pair: Trading pair in the format "BASE/QUOTE"
+        - interval: Interval label of the candles (e.g., "1min", "1h")
+        - ohlc_df: DataFrame with open, high, low, close, volume columns and either a
+          'timestamp' column or a DatetimeIndex
+
+        Returns:
+        - Number of candles appended
+        """
+        timestamps = ohlc_df['timestamp'] if 'timestamp' in ohlc_df.columns else ohlc_df.index
+        timestamps = pd.DatetimeIndex(pd.to_datetime(timestamps, utc=True)).as_unit('ns').asi8.astype('<i8')
+
+        last_timestamp = self.last_timestamp(crypto_pair, interval)
+        keep = timestamps > last_timestamp if last_timestamp is not None else np.ones(len(timestamps), dtype=bool)
+        if len(timestamps) > 1 and np.any(np.diff(timestamps[keep]) <= 0):
+            raise ValueError("Candles must be sorted by strictly increasing timestamp")
+        if not keep.any():
+            return 0
+
+        path = self._path(crypto_pair, interval)
+        os.makedirs(path, exist_ok=True)
+        rows = self.count(crypto_pair, interval)
+
+        # Drop whatever an interrupted append left past the published candles
+        for column in CANDLE_COLUMNS:
+            self._truncate(path, column, rows)
+        self._truncate(path, 'index', (rows + INDEX_STRIDE - 1) // INDEX_STRIDE)
+
+        for column in CANDLE_COLUMNS:
+            values = ohlc_df[column].to_numpy(dtype='<f8')[keep]
+            with open(self._column_file(path, column), 'ab') as file:
+                file.write(values.tobytes())
+
+        new_timestamps = timestamps[keep]
+        first_indexed = -rows % INDEX_STRIDE
+        with open(self._column_file(path, 'index'), 'ab') as file:
+            file.write(new_timestamps[first_indexed::INDEX_STRIDE].tobytes())
+        # The timestamp column is written last: it is what publishes the new candles to readers
+        with open(self._column_file(path, 'timestamp'), 'ab') as file:
+            file.write(new_timestamps.tobytes())
+
+        logging.info(f"Archived {len(new_timestamps)} {interval} candles for {crypto_pair}.")
+        return len(new_timestamps)
+
+    def _locate(self, timestamp, index, value):
+        # The sparse index narrows the search to a single stride of the timestamp column
+        block = int(np.searchsorted(index, value, side='left'))
+        lo = max(block - 1, 0) * INDEX_STRIDE
+        hi = min(block * INDEX_STRIDE + 1, len(timestamp))
+        return lo + int(np.searchsorted(timestamp[lo:hi], value, side='left'))
+
+    def read(self, crypto_pair, interval, start_time=None, end_time=None):
+        """
+        Memory-map the candles of a pair in [start_time, end_time) without copying.
+
+        Parameters:
+        - crypto_pair: Trading pair in the format "BASE/QUOTE"
+        - interval: Interval label of the candles
+        - start_time, end_time: Optional bounds (anything pandas.Timestamp accepts; naive means UTC)
+
+        Returns:
+        - CandleSlice
+        """
+        rows = self.count(crypto_pair, interval)
+        if rows == 0:
+            return CandleSlice(np.empty(0, dtype='<i8'), {column: np.empty(0, dtype='<f8') for column in CANDLE_COLUMNS})
+
+        path = self._path(crypto_pair, interval)
+        timestamp = self._map(path, 'timestamp', '<i8', rows)
+        index = self._map(path, 'index', '<i8', (rows + INDEX_STRIDE - 1) // INDEX_STRIDE)
+
+        lo = 0 if start_time is None else self._locate(timestamp, index, _to_ns(start_time))
+        hi = rows if end_time is None else self._locate(timestamp, index, _to_ns(end_time))
+        columns = {column: self._map(path, column, '<f8', rows)[lo:hi] for column in CANDLE_COLUMNS}
+        return CandleSlice(timestamp[lo:hi], columns)
+
+    def tail(self, crypto_pair, interval, num_points):
+        """
+        Memory-map the most recent num_points candles.
+        """
+        rows = self.count(crypto_pair, interval)
+        window = self.read(crypto_pair, interval)
+        start = max(rows - num_points, 0)
+        return CandleSlice(window.timestamp[start:], {column: values[start:] for column, values in window.columns.items()})
+
+
+def _to_ns(value):
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.tz_localize('UTC')
+    return timestamp.as_unit('ns').value
+
+
+def load_candles(crypto_pair, interval, num_points, network_url="https://horizon.stellar.org", archive=None, rate_limiter=None):
+    """
+    Latest num_points candles: archived history plus a live fetch of the candles after it.
+
+    Without archived candles for the series this is the same as fetch_exchange_data, with
+    them only the gap since the newest archived candle is fetched from Horizon.
+
+    Parameters:
+    - rate_limiter: Optional RateLimiter throttling the live fetch
+
+    Returns:
+    - DataFrame shaped like fetch_exchange_data's output
+    """
+    archive = archive or CandleArchive()
+    last_timestamp = archive.last_timestamp(crypto_pair, interval)
+    if last_timestamp is None:
+        return fetch_exchange_data(network_url=network_url, crypto_pair=crypto_pair, interval=interval, num_points=num_points,
+                                   rate_limiter=rate_limiter)
+
+    missing = min(_live_gap(last_timestamp, interval), num_points)
+    live = fetch_exchange_data(network_url=network_url, crypto_pair=crypto_pair, interval=interval, num_points=missing,
+                               rate_limiter=rate_limiter)
+
+    history = archive.tail(crypto_pair, interval, num_points).to_frame()
+    if live.empty:
+        return history
+    price_df = pd.concat([history, live], ignore_index=True).drop_duplicates('timestamp', keep='last')
+    return price_df.iloc[-num_points:].reset_index(drop=True)
+
+
+def _live_gap(last_timestamp, interval):
+    # Candles from the newest archived one up to now, which have to be fetched live
+    gap = pd.Timestamp.now(tz='UTC') - pd.Timestamp(last_timestamp, tz='UTC')
+    return int(gap / pd.to_timedelta(interval)) + 1
+
+
+def max_window(crypto_pair, interval, archive=None):
+    """
+    Largest window load_candles serves while fetching at most MAX_LIVE_POINTS candles live.
+
+    Windows beyond MAX_LIVE_POINTS need archived candles that reach up to the last
+    MAX_LIVE_POINTS intervals; run engine.backfill and archive the trades to extend them.
+
+    Returns:
+    - Number of candles
+    """
+    archive = archive or CandleArchive()
+    last_timestamp = archive.last_timestamp(crypto_pair, interval)
+    if last_timestamp is None:
+        return MAX_LIVE_POINTS
+    gap = _live_gap(last_timestamp, interval)
+    if gap > MAX_LIVE_POINTS:
+        return MAX_LIVE_POINTS
+    return max(archive.count(crypto_pair, interval) + gap - 1, MAX_LIVE_POINTS)
+
+
+def archive_backfill(trades_dir="data/trades", archive_root="data/candles", intervals=("1min",), crypto_pairs=None):
+    """
+    Aggregate backfilled trade shards into the candle archive.
+
+    The newest candle of each series may still be incomplete, so it is held back until a
+    later backfill produces a newer one.
+
+    Returns:
+    - Dict mapping (crypto_pair, interval) to the number of candles appended
+    """
+    from engine.backfill import default_pairs, load_trades
+
+    archive = CandleArchive(archive_root)
+    appended = {}
+    for crypto_pair in crypto_pairs or default_pairs():
+        for interval in intervals:
+            last_timestamp = archive.last_timestamp(crypto_pair, interval)
+            start_time = pd.Timestamp(last_timestamp, tz='UTC') if last_timestamp is not None else None
+            trade_df = load_trades(trades_dir, crypto_pair, start_time=start_time)
+            if trade_df.empty:
+                appended[(crypto_pair, interval)] = 0
+                continue
+            ohlc = trades_to_ohlc(trade_df, interval).iloc[:-1]
+            appended[(crypto_pair, interval)] = archive.append(crypto_pair, interval, ohlc)
+    return appended
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the memory-mapped candle archive from backfilled trades.")
+    parser.add_argument("--trades", default="data/trades", help="Backfill output directory")
+    parser.add_argument("--out", default="data/candles", help="Candle archive directory")
+    parser.add_argument("--intervals", nargs="*", default=["1min", "5min", "15min", "1h", "1d"])
+    parser.add_argument("--pairs", nargs="*", default=None, help="Pairs such as XLM/USDC (defaults to all config pairs)")
+    args = parser.parse_args(argv)
+
+    archive_backfill(args.trades, args.out, intervals=args.intervals, crypto_pairs=args.pairs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+import logging
+from engine.utils import lazy_import
+
+# Heavy dependencies are imported on first use to keep engine imports fast
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+go = lazy_import("plotly.graph_objects")
+
+# Set up logging configuration
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+MAX_POINTS = 800  # Buckets drawn per chart, roughly one per horizontal pixel pair
+SIGNAL_CODES = {'Buy': 1, 'Sell': -1}
+
+
+def bucket_width(length, max_points=MAX_POINTS):
+    """
+    Smallest power of two such that `length` candles fit in `max_points` buckets.
+    """
+    width = 1
+    while -(-length // width) > max_points:
+        width *= 2
+    return width
+
+
+def downsample_ohlc(columns, width, start=0):
+    """
+    Min/max downsampling: merge every `width` consecutive candles into one candle.
+
+    Each bucket keeps the first open and timestamp, the highest high, the lowest low, the last
+    close and signal and the summed volume, so spikes survive downsampling. The line series
+    keeps the lowest and highest mid price of every bucket in time order.
+
+    Parameters:
+    - columns: Dict of equally long arrays (timestamp, open, high, low, close, volume, signal)
+    - width: Candles per bucket
+    - start: First candle to aggregate (must be a multiple of width)
+
+    Returns:
+    - Dict of bucket arrays, with line_x/line_y of shape (buckets, 2)
+    """
+    length = len(columns['timestamp'])
+    starts = np.arange(start, length, width)
+    ends = np.minimum(starts + width, length) - 1
+    offsets = starts - start
+    buckets = {
+        'timestamp': columns['timestamp'][starts],
+        'open': columns['open'][starts],
+        'high': np.fmax.reduceat(columns['high'][start:], offsets),
+        'low': np.fmin.reduceat(columns['low'][start:], offsets),
+        'close': columns['close'][ends],
+        'volume': np.add.reduceat(np.nan_to_num(columns['volume'][start:]), offsets),
+        'signal': columns['signal'][ends],
+    }
+
+    # Lowest and highest mid price of each bucket, padded to whole buckets
+    mid = (columns['open'][start:] + columns['close'][start:]) / 2
+    padded = np.full(len(starts) * width, np.nan)
+    padded[:len(mid)] = mid
+    padded = padded.reshape(-1, width)
+    lowest = np.where(np.isnan(padded), np.inf, padded).argmin(axis=1)
+    highest = np.where(np.isnan(padded), -np.inf, padded).argmax(axis=1)
+    points = np.sort(np.stack([lowest, highest], axis=1), axis=1)
+    rows = np.arange(len(starts))[:, None]
+    buckets['line_y'] = padded[rows, points]
+    buckets['line_x'] = columns['timestamp'][np.minimum(starts[:, None] + points, length - 1)]
+    return buckets
+
+
+class ChartState:
+    """
+    Downsampled candles of one pair and interval, updated incrementally across reruns.
+
+    The full candle arrays are kept, but the charts only ever draw `max_points` buckets.
+    When new candles arrive only the buckets from the first changed candle onwards are
+    recomputed and the existing figures get new trace data instead of being rebuilt.
+    When the series outgrows `max_points` buckets the bucket width doubles.
+
+    Parameters:
+    - max_points: Maximum number of buckets drawn per chart
+    """
+    def __init__(self, max_points=MAX_POINTS):
+        self.max_points = max_points
+        self.key = None
+        self.window = 0
+        self.columns = None
+        self.width = 1
+        self.buckets = None
+        self.figures = {}
+
+    def __len__(self):
+        return 0 if self.columns is None else len(self.columns['timestamp'])
+
+    def reset(self):
+        self.key = None
+        self.columns = None
+        self.width = 1
+        self.buckets = None
+        self.figures = {}
+
+    def _rebucket(self, changed):
+        """
+        Recompute buckets from the candle at index `changed` onwards.
+        """
+        # The width only grows between resets, so trimming the front never re-buckets
+        width = bucket_width(len(self), self.max_points)
+        if self.buckets is not None:
+            width = max(width, self.width)
+        if width != self.width or self.buckets is None:
+            self.width, changed = width, 0
+
+        first = changed // self.width
+        tail = downsample_ohlc(self.columns, self.width, first * self.width)
+        if first == 0:
+            self.buckets = tail
+        else:
+            self.buckets = {name: np.concatenate([values[:first], tail[name]]) for name, values in self.buckets.items()}
+
+    def update(self, price_df, key=None):
+        """
+        Merge the latest candles into the state.
+
+        Candles newer than the last known one are appended and the last known candle is
+        replaced (it may still have been forming). Switching to another key, a frame that
+        reaches further back or not as far as the known candles, or a window short enough for
+        narrower buckets resets the state.
+
+        Parameters:
+        - price_df: OHLC DataFrame as returned by fetch_exchange_data (optionally with Signal)
+        - key: Identifies the series, e.g. (crypto_pair, interval)
+
+        Returns:
+        - Number of candles appended or replaced
+        """
+        if price_df.empty:
+            self.reset()
+            return 0
+
+        timestamp = pd.DatetimeIndex(pd.to_datetime(price_df['timestamp'], utc=True)).as_unit('ns').asi8
+        signal = price_df['Signal'].map(SIGNAL_CODES).fillna(0).to_numpy(np.int8) if 'Signal' in price_df.columns else np.zeros(len(price_df), np.int8)
+        incoming = {'timestamp': timestamp, 'signal': signal}
+        for column in ['open', 'high', 'low', 'close', 'volume']:
+            incoming[column] = price_df[column].to_numpy(np.float64) if column in price_df.columns else np.full(len(price_df), np.nan)
+
+        # A window that fits finer buckets than the current width is bucketed afresh
+        if (key != self.key or self.columns is None or timestamp[0] < self.columns['timestamp'][0]
+                or timestamp[-1] < self.columns['timestamp'][-1] or bucket_width(len(price_df), self.max_points) < self.width):
+            self.reset()
+            self.key, self.window = key, len(price_df)
+            self.columns = incoming
+            self._rebucket(0)
+            return len(price_df)
+
+        # Keep candles before the last known one, replace everything from it onwards
+        last = self.columns['timestamp'][-1]
+        keep = len(self) - 1 if timestamp[0] <= last else len(self)
+        new_rows = timestamp >= last if keep < len(self) else np.ones(len(timestamp), bool)
+        self.columns = {name: np.concatenate([values[:keep], incoming[name][new_rows]]) for name, values in self.columns.items()}
+        self.window = len(price_df)
+        self._rebucket(keep)
+
+        # Drop whole stale buckets from the front so the bucket grid stays aligned
+        stale = (len(self) - self.window) // self.width
+        if stale > 0:
+            self.columns = {name: values[stale * self.width:] for name, values in self.columns.items()}
+            self.buckets = {name: values[stale:] for name, values in self.buckets.items()}
+
+        return int(new_rows.sum())
+
+    def _traces(self, kind):
+        buckets = self.buckets
+        x = pd.to_datetime(buckets['timestamp'], unit='ns', utc=True)
+        buy = buckets['signal'] == 1
+        sell = buckets['signal'] == -1
+        if kind == 'candlestick':
+            main = dict(x=x, open=buckets['open'], high=buckets['high'], low=buckets['low'], close=buckets['close'])
+            buy_y, sell_y = buckets['low'][buy], buckets['high'][sell]
+        else:
+            points = 1 if self.width == 1 else 2
+            main = dict(x=pd.to_datetime(buckets['line_x'][:, :points].ravel(), unit='ns', utc=True), y=buckets['line_y'][:, :points].ravel())
+            buy_y, sell_y = buckets['close'][buy], buckets['close'][sell]
+        return [main, dict(x=x[buy], y=buy_y), dict(x=x[sell], y=sell_y), dict(x=x, y=buckets['volume'])]
+
+    def figure(self, kind, layout=None):
+        """
+        Candlestick or line figure of the current buckets with Buy/Sell markers and volume.
+
+        The figure is created once per series; later calls only swap the trace data.
+
+        Parameters:
+        - kind: "candlestick" or "line"
+        - layout: Plotly layout arguments applied when the figure is created
+        """
+        data = self._traces(kind)
+        figure = self.figures.get(kind)
+        if figure is None:
+            figure = go.Figure([
+                go.Candlestick(**data[0]) if kind == 'candlestick' else go.Scatter(mode='lines', name='Price', **data[0]),
+                go.Scatter(mode='markers', name='Buy Signal', marker=dict(symbol='triangle-up', color='blue' if kind == 'candlestick' else 'magenta', size=10), **data[1]),
+                go.Scatter(mode='markers', name='Sell Signal', marker=dict(symbol='triangle-down', color='magenta' if kind == 'candlestick' else 'red', size=10), **data[2]),
+                go.Bar(name='Volume', yaxis='y2', opacity=0.3, **data[3]),
+            ])
+            figure.update_layout(**(layout or {}))
+            self.figures[kind] = figure
+        else:
+            for trace, values in zip(figure.data, data):
+                trace.update(values)
+        return figure
@@ -0,0 +1,36 @@
+import sys
+import argparse
+import importlib
+
+# Subcommand -> (module providing main(argv), description). Modules are imported only when run.
+COMMANDS = {
+    "backfill": ("engine.backfill", "Backfill historical trades into Parquet shards"),
+    "archive": ("engine.candle_archive", "Build the memory-mapped candle archive from backfilled trades"),
+    "scan": ("engine.scanner", "Scan every configured pair for actionable strategy signals"),
+    "replay": ("engine.simulator", "Replay backfilled trades through the paper-trading bot"),
+    "assets": ("engine.asset_registry", "Refresh and query the local asset catalog"),
+    "journal": ("engine.journal", "Replay the trading event journal and reproduce past decisions"),
+}
+
+
+def main(argv=None):
+    """
+    Entry point of `python -m engine <command> [options]`.
+
+    Only argparse runs before a command is chosen; the command's module (and with it pandas,
+    numpy and stellar_sdk) is imported afterwards, so --help and argument errors are instant.
+    """
+    commands = "\n".join(f"  {name:<10}{description}" for name, (_, description) in COMMANDS.items())
+    parser = argparse.ArgumentParser(
+        prog="python -m engine",
+        description="Stellar Trading Bot tools.",
+        epilog=f"commands:\n{commands}\n\nRun 'python -m engine <command> --help' for command options.",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("command", choices=COMMANDS, metavar="command")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help=argparse.SUPPRESS)
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    module_name, _ = COMMANDS[args.command]
+    sys.argv[0] = f"python -m engine {args.command}"  # Shown in the command's own usage message
+    return importlib.import_module(module_name).main(args.args)
@@ -0,0 +1,47 @@
+import os
+import threading
+from engine.utils import load_config
+
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config", "config.yaml")
+
+
+class Config:
+    """
+    Application configuration, read from YAML on first access rather than at import time.
+
+    The file defaults to config/config.yaml next to the engine package, independent of the
+    working directory, and can be overridden with the STELLAR_BOT_CONFIG environment variable.
+    Supports the read-only dict access the engine uses (config['asset_issuers'], config.get(...)).
+    """
+    def __init__(self, path=None):
+        self.path = path
+        self._data = None
+        self._lock = threading.Lock()
+
+    @property
+    def data(self):
+        if self._data is None:
+            with self._lock:
+                if self._data is None:
+                    self._data = load_config(self.path or os.environ.get("STELLAR_BOT_CONFIG", DEFAULT_CONFIG_PATH)) or {}
+        return self._data
+
+    def reload(self):
+        self._data = None
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    @property
+    def asset_issuers(self):
+        return self.get('asset_issuers', {})
+
+
+# Shared instance used throughout the engine and the Streamlit app
+config = Config()
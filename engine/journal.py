@@ -0,0 +1,348 @@
+import os
+import json
+import time
+import logging
+import argparse
+import threading
+
+# Set up logging configuration
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+EVENT_TYPES = ("candles", "signal", "order", "submit", "fill", "history")
+DURABLE_EVENT_TYPES = ("order", "submit")  # fsynced as soon as they are appended
+SEGMENT_SUFFIX = ".jsonl"
+SEGMENT_BYTES = 64 * 1024 * 1024  # A new segment file is started past this size
+
+
+def _to_json(value):
+    # numpy scalars, pandas Timestamps and the like
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+_encoder = json.JSONEncoder(separators=(',', ':'), default=_to_json)
+
+
+def list_segments(path):
+    """
+    Segment files of a journal, oldest first, as (first_seq, file_path).
+    """
+    if not os.path.isdir(path):
+        return []
+    names = sorted(name for name in os.listdir(path) if name.endswith(SEGMENT_SUFFIX))
+    return [(int(name[:-len(SEGMENT_SUFFIX)]), os.path.join(path, name)) for name in names]
+
+
+class EventJournal:
+    """
+    Append-only journal of trading events, one JSON object per line.
+
+    Every event gets a sequence number, the wall-clock time and its type, followed by the
+    event fields: {"seq":1,"time":1700000000.0,"type":"signal",...}. Events are written to
+    segment files named after their first sequence number; a new segment is started once
+    the current one exceeds `segment_bytes`.
+
+    Every event is handed to the OS as it is appended, so a crash of the process loses
+    nothing. Events are fsynced in batches, after `fsync_every` events or, from a background
+    thread, within `fsync_interval` seconds, so an OS crash or power loss loses at most the
+    events of the last interval. Order intents and submit results are fsynced right away.
+    On opening, a line torn by a crash is cut off and numbering continues after the last
+    complete event.
+
+    Parameters:
+    - path: Journal directory
+    - fsync_every: Number of events per fsync batch
+    - fsync_interval: Maximum seconds an appended event waits for its fsync
+    - segment_bytes: Size after which a new segment file is started
+    """
+    def __init__(self, path="data/journal", fsync_every=256, fsync_interval=1.0, segment_bytes=SEGMENT_BYTES):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.segment_bytes = segment_bytes
+        self._lock = threading.Lock()
+        self._pending = 0
+
+        os.makedirs(path, exist_ok=True)
+        segments = list_segments(path)
+        self.seq = self._recover(segments[-1]) if segments else 0
+        self._file = None
+        self._segment_size = 0
+        if segments and os.path.getsize(segments[-1][1]) < segment_bytes:
+            self._file = open(segments[-1][1], 'ab')
+            self._segment_size = os.path.getsize(segments[-1][1])
+
+        self._closed = threading.Event()
+        self._syncer = threading.Thread(target=self._sync_periodically, name="journal-fsync", daemon=True)
+        self._syncer.start()
+
+    @staticmethod
+    def _recover(segment):
+        """
+        Cut off a torn last line and return the sequence number of the last complete event.
+        """
+        first_seq, file_path = segment
+        with open(file_path, 'rb+') as file:
+            size = file.seek(0, os.SEEK_END)
+            position = max(size - 65536, 0)
+            file.seek(position)
+            tail = file.read()
+            while position > 0 and tail.count(b"\n") < 2:
+                position = max(position - 65536, 0)
+                file.seek(position)
+                tail = file.read()
+
+            complete = tail.rfind(b"\n") + 1
+            if position + complete < size:
+                logging.warning(f"Truncating {size - position - complete} bytes of a torn event in {file_path}.")
+                file.truncate(position + complete)
+
+        lines = tail[:complete].splitlines()
+        if not lines:
+            return first_seq - 1
+        return json.loads(lines[-1])['seq']
+
+    def append(self, event_type, **fields):
+        """
+        Append an event.
+
+        Returns:
+        - Sequence number of the event
+        """
+        with self._lock:
+            self.seq += 1
+            line = _encoder.encode({'seq': self.seq, 'time': time.time(), 'type': event_type, **fields}).encode() + b"\n"
+            if self._file is None or self._segment_size >= self.segment_bytes:
+                self._rotate()
+            self._file.write(line)
+            self._file.flush()
+            self._segment_size += len(line)
+
+            self._pending += 1
+            if self._pending >= self.fsync_every or event_type in DURABLE_EVENT_TYPES:
+                self._sync()
+            return self.seq
+
+    def _sync_periodically(self):
+        # Events appended between fsync batches reach the disk within fsync_interval
+        while not self._closed.wait(self.fsync_interval):
+            with self._lock:
+                if self._pending:
+                    self._sync()
+
+    def _rotate(self):
+        if self._file is not None:
+            self._sync()
+            self._file.close()
+        self._file = open(os.path.join(self.path, f"{self.seq:012d}{SEGMENT_SUFFIX}"), 'ab')
+        self._segment_size = 0
+
+    def _sync(self):
+        if self._file is not None and self._pending:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self._pending = 0
+
+    def sync(self):
+        """
+        Flush and fsync all appended events.
+        """
+        with self._lock:
+            self._sync()
+
+    def close(self):
+        self._closed.set()
+        with self._lock:
+            self._sync()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _parse_lines(lines, file_path):
+    # One json.loads call per batch is several times faster than one per line
+    try:
+        return json.loads(b"[" + b",".join(lines) + b"]")
+    except ValueError:
+        events = []
+        for line in lines:
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                logging.warning(f"Skipping unreadable event in {file_path}.")
+        return events
+
+
+def read_events(path="data/journal", start_seq=1, end_seq=None, event_types=None, batch_bytes=8 * 1024 * 1024):
+    """
+    Yield journal events in order.
+
+    Segments ending before start_seq are skipped without being read. Lines of unwanted
+    event types are dropped before they are parsed, and the rest is parsed in batches.
+
+    Parameters:
+    - path: Journal directory
+    - start_seq, end_seq: Sequence number range (inclusive)
+    - event_types: Only yield these event types
+    - batch_bytes: Bytes read and parsed at a time
+    """
+    segments = list_segments(path)
+    markers = [f'"type":"{event_type}"'.encode() for event_type in event_types] if event_types else None
+
+    for index, (first_seq, file_path) in enumerate(segments):
+        if index + 1 < len(segments) and segments[index + 1][0] <= start_seq:
+            continue
+        if end_seq is not None and first_seq > end_seq:
+            return
+
+        with open(file_path, 'rb') as file:
+            remainder = b""
+            while True:
+                chunk = file.read(batch_bytes)
+                if not chunk:
+                    break
+                chunk = remainder + chunk
+                complete = chunk.rfind(b"\n") + 1  # A line still being written is left for later
+                remainder = chunk[complete:]
+                lines = chunk[:complete].splitlines()
+                if markers:
+                    lines = [line for line in lines if any(marker in line for marker in markers)]
+
+                for event in _parse_lines(lines, file_path):
+                    if event['seq'] < start_seq:
+                        continue
+                    if end_seq is not None and event['seq'] > end_seq:
+                        return
+                    if event_types and event['type'] not in event_types:
+                        continue
+                    yield event
+
+
+class JournalState:
+    """
+    Bot state rebuilt from journal events.
+
+    - last_seq: Sequence number of the last applied event
+    - candles: Timestamp (ns) of the newest candle consumed per pair
+    - signals: Last signal event per pair
+    - balances: Balances the last decision was made with
+    - orders: Order intents by sequence number, with their submit result once known
+    - fills: Fill events in order
+    """
+    def __init__(self):
+        self.last_seq = 0
+        self.events = 0
+        self.candles = {}
+        self.signals = {}
+        self.balances = []
+        self.orders = {}
+        self.fills = []
+
+    def apply(self, event):
+        self.last_seq = event['seq']
+        self.events += 1
+        event_type = event['type']
+        if event_type == 'candles':
+            if event['timestamp']:
+                self.candles[event['pair']] = event['timestamp'][-1]
+        elif event_type == 'signal':
+            self.signals[event['pair']] = event
+            self.balances = event.get('balances', self.balances)
+        elif event_type == 'order':
+            self.orders[event['seq']] = {**event, 'result': None}
+        elif event_type == 'submit':
+            order = self.orders.get(event.get('order'))
+            if order is not None:
+                order['result'] = event
+        elif event_type == 'fill':
+            self.fills.append(event)
+
+    @property
+    def pending_orders(self):
+        """
+        Order intents without a recorded submit result (e.g. interrupted by a crash).
+        """
+        return [order for order in self.orders.values() if order['result'] is None]
+
+
+def replay_journal(path="data/journal", state=None, start_seq=None):
+    """
+    Rebuild bot state from a journal, continuing from `state` if given.
+
+    Returns:
+    - JournalState
+    """
+    state = state or JournalState()
+    for event in read_events(path, start_seq=start_seq or state.last_seq + 1):
+        state.apply(event)
+    return state
+
+
+def candles_frame(event):
+    """
+    DataFrame of the candles recorded in a "candles" event, as do_exchange received them.
+    """
+    import pandas as pd
+
+    price_df = pd.DataFrame({column: event[column] for column in ('open', 'high', 'low', 'close', 'volume') if column in event})
+    price_df.insert(0, 'timestamp', pd.to_datetime(event['timestamp'], unit='ns', utc=True))
+    return price_df
+
+
+def reproduce_decision(path, signal_seq):
+    """
+    Recompute a past decision from the candles, balances and strategy definition it was made with.
+
+    Parameters:
+    - path: Journal directory
+    - signal_seq: Sequence number of the "signal" event
+
+    Returns:
+    - Dict with the recorded and the reproduced decision and whether they match
+    """
+    from engine.strategies import TradingStrategy
+    from engine.trading_bot import decide
+
+    signal = next(read_events(path, start_seq=signal_seq, end_seq=signal_seq), None)
+    if signal is None or signal['type'] != 'signal':
+        raise ValueError(f"Event {signal_seq} is not a signal event.")
+    candles = next(read_events(path, start_seq=signal['candles'], end_seq=signal['candles']))
+
+    base_asset_code, counter_asset_code = signal['pair'].split('/')
+    decision = decide(base_asset_code, counter_asset_code, candles_frame(candles), signal['balances'], TradingStrategy(signal['strategy'], signal.get('params'), signal.get('definition')))
+    recorded = {key: signal[key] for key in decision}
+    return {
+        'recorded': recorded,
+        'reproduced': decision,
+        'matches': recorded == decision,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize, replay and reproduce decisions from the trading event journal.")
+    parser.add_argument("--path", default="data/journal", help="Journal directory")
+    parser.add_argument("--reproduce", type=int, nargs="*", default=[], help="Sequence numbers of signal events to recompute")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    state = replay_journal(args.path)
+    elapsed = time.perf_counter() - started
+    logging.info(f"Replayed {state.events} events up to seq {state.last_seq} in {elapsed:.2f}s.")
+    logging.info(f"{len(state.orders)} orders ({len(state.pending_orders)} without result), {len(state.fills)} fills, "
+                 f"last signals: { {pair: event['signal'] for pair, event in state.signals.items()} }")
+
+    for signal_seq in args.reproduce:
+        result = reproduce_decision(args.path, signal_seq)
+        logging.info(f"Signal {signal_seq}: recorded {result['recorded']}, reproduced {result['reproduced']}, "
+                     f"{'match' if result['matches'] else 'MISMATCH'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from engine.trading_bot import HISTORY_COLUMNS, HORIZON_URLS, OFFER_COLUMNS, TradingBot
+from engine.utils import lazy_import
+
+# Heavy dependencies are imported on first use to keep engine imports fast
+pd = lazy_import("pandas")
+stellar_sdk = lazy_import("stellar_sdk")
+requests_client = lazy_import("stellar_sdk.client.requests_client")
+
+# Set up logging configuration
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def account_label(public_key):
+    return f"{public_key[:4]}..{public_key[-4:]}"
+
+
+class Portfolio:
+    """
+    Several trading accounts managed from one process.
+
+    Every account gets a TradingBot sharing a single pooled Horizon client. Accounts are
+    loaded once, and balances, offers and history of all accounts are fetched concurrently,
+    so refreshing the portfolio takes about as long as refreshing one account.
+
+    Parameters:
+    - stellar_keys: List of secret keys, or dict mapping account labels to secret keys
+    - network: "testnet" or "mainnet"
+    - max_workers: Number of concurrent Horizon requests (also the connection pool size)
+    """
+    def __init__(self, stellar_keys, network="testnet", max_workers=8):
+        self.network = network
+        self.max_workers = max_workers
+        self.server = stellar_sdk.Server(
+            horizon_url=HORIZON_URLS[network],
+            client=requests_client.RequestsClient(pool_size=max_workers),
+        )
+
+        if not isinstance(stellar_keys, dict):
+            keypairs = [stellar_sdk.Keypair.from_secret(stellar_key) for stellar_key in stellar_keys]
+            stellar_keys = {account_label(keypair.public_key): keypair.secret for keypair in keypairs}
+        self.bots = {
+            label: TradingBot(stellar_key, network=network, server=self.server, load_account=False)
+            for label, stellar_key in stellar_keys.items()
+        }
+
+    def _map(self, task):
+        """
+        Run task(bot) for every account concurrently.
+
+        Returns:
+        - Dict mapping account labels to results (accounts whose task raised are left out)
+        """
+        results = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {label: executor.submit(task, bot) for label, bot in self.bots.items()}
+            for label, future in futures.items():
+                try:
+                    results[label] = future.result()
+                except Exception as e:
+                    logging.error(f"Error for account {label}: {e}")
+        return results
+
+    def load(self):
+        """
+        Load every account (sequence numbers are needed before placing orders).
+        """
+        return self._map(lambda bot: bot.load_account())
+
+    def fetch_balances(self):
+        return self._map(lambda bot: bot.get_balances())
+
+    def fetch_offers(self):
+        return self._map(lambda bot: bot.fetch_offers())
+
+    def fetch_history(self):
+        return self._map(lambda bot: bot.fetch_trading_history())
+
+    def snapshot(self):
+        """
+        Fetch balances, offers and history of every account in one concurrent batch.
+
+        Returns:
+        - Dict with 'balances', 'offers' and 'history' DataFrames covering all accounts
+          (an 'Account' column tells them apart)
+        """
+        tasks = {
+            'balances': lambda bot: bot.get_balances(),
+            'offers': lambda bot: bot.fetch_offers(),
+            'history': lambda bot: bot.fetch_trading_history(),
+        }
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                (kind, label): executor.submit(task, bot)
+                for kind, task in tasks.items()
+                for label, bot in self.bots.items()
+            }
+            results = {kind: {} for kind in tasks}
+            for (kind, label), future in futures.items():
+                try:
+                    results[kind][label] = future.result()
+                except Exception as e:
+                    logging.error(f"Error fetching {kind} for account {label}: {e}")
+
+        return {
+            'balances': _combine(results['balances'], ["Asset", "Balance"]),
+            'offers': _combine(results['offers'], OFFER_COLUMNS),
+            'history': _combine(results['history'], HISTORY_COLUMNS),
+        }
+
+    def aggregate_balances(self, balances=None):
+        """
+        Portfolio-wide balances: one row per asset, one column per account plus a Total.
+
+        Parameters:
+        - balances: Combined balances from snapshot() (fetched if omitted)
+        """
+        if balances is None:
+            balances = _combine(self.fetch_balances(), ["Asset", "Balance"])
+        if balances.empty:
+            return pd.DataFrame(columns=["Asset", "Total"])
+
+        view = balances.pivot_table(index="Asset", columns="Account", values="Balance", aggfunc="sum", fill_value=0.0)
+        view["Total"] = view.sum(axis=1)
+        return view.sort_values("Total", ascending=False).reset_index()
+
+
+def _combine(results, columns):
+    """
+    Stack per-account results (lists of dicts or DataFrames) into one DataFrame with an Account column.
+    """
+    frames = []
+    for label, result in results.items():
+        frame = result if isinstance(result, pd.DataFrame) else pd.DataFrame(result, columns=columns)
+        if not frame.empty:
+            frames.append(frame.assign(Account=label))
+    if not frames:
+        return pd.DataFrame(columns=["Account", *columns])
+    combined = pd.concat(frames, ignore_index=True)
+    return combined[["Account", *[column for column in combined.columns if column != "Account"]]]
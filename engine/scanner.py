@@ -0,0 +1,192 @@
+import time
+import argparse
+import logging
+import itertools
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import pytz
+from engine.asset_registry import get_registry, network_for_url
+from engine.stellar_api import fetch_trades, get_asset, trades_to_ohlc
+from engine.strategies import compile_strategies, list_strategies, evaluate_strategies
+from engine.utils import RateLimiter, lazy_import
+
+# Heavy dependencies are imported on first use to keep engine imports fast
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+stellar_sdk = lazy_import("stellar_sdk")
+requests_client = lazy_import("stellar_sdk.client.requests_client")
+
+# Set up logging configuration
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+SCAN_COLUMNS = ["Pair", "Strategy", "Signal", "Strength", "Close", "Updated"]
+
+
+def invert_trades(trade_df):
+    """
+    Express trades of BASE/COUNTER as trades of COUNTER/BASE.
+    """
+    inverted = trade_df.copy()
+    inverted['price'] = 1 / trade_df['price']
+    inverted['volume'] = trade_df['volume'] * trade_df['price']
+    inverted['amount'] = inverted['volume']
+    return inverted
+
+
+class MarketScanner:
+    """
+    Evaluate every strategy on every ordered pair of the configured assets.
+
+    Trades are fetched once per unordered pair, concurrently over one pooled Horizon
+    client, and both directions are derived from them. Signals for all pairs are then
+    computed in a single vectorized pass over all strategies.
+
+    Parameters:
+    - network_url: URL of the Stellar Horizon API
+    - assets: Asset codes to scan (defaults to the tradable assets of the asset registry)
+    - interval: Candle interval (e.g., "1min", "1h")
+    - num_points: Number of candles handed to each strategy, as in fetch_exchange_data
+    - strategies: Strategy names or variants to evaluate (defaults to list_strategies(), see compile_strategies)
+    - max_workers: Number of concurrent Horizon requests
+    - requests_per_second: Horizon request budget shared by all workers (public Horizon allows 1)
+    """
+    def __init__(self,
+                 network_url="https://horizon.stellar.org",
+                 assets=None,
+                 interval="1min",
+                 num_points=60,
+                 strategies=None,
+                 max_workers=16,
+                 requests_per_second=1.0):
+        self.network = network_for_url(network_url)
+        self.assets = list(assets or get_registry(self.network).asset_codes())
+        self.interval = interval
+        self.num_points = num_points
+        self.strategies = list(strategies or list_strategies())
+        self.max_workers = max_workers
+        self.server = stellar_sdk.Server(network_url, client=requests_client.RequestsClient(pool_size=max_workers))
+        self.rate_limiter = RateLimiter(requests_per_second)
+
+    def pairs(self):
+        return [f"{base}/{counter}" for base, counter in itertools.permutations(self.assets, 2)]
+
+    def _fetch_pair_trades(self, base_asset_code, counter_asset_code, start_time):
+        trade_data = fetch_trades(self.server, get_asset(base_asset_code, self.network), get_asset(counter_asset_code, self.network), start_time,
+                                  rate_limiter=self.rate_limiter)
+        return pd.DataFrame(trade_data, columns=['timestamp', 'price', 'amount', 'volume'])
+
+    def fetch_candles(self):
+        """
+        Fetch the latest candles of every ordered pair.
+
+        Returns:
+        - Dict mapping "BASE/QUOTE" to an OHLC DataFrame shaped like fetch_exchange_data's output
+        """
+        start_time = datetime.now(pytz.utc) - pd.to_timedelta(self.interval) * self.num_points
+        candles = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(self._fetch_pair_trades, base, counter, start_time): (base, counter)
+                for base, counter in itertools.combinations(self.assets, 2)
+            }
+            for future in as_completed(futures):
+                base, counter = futures[future]
+                try:
+                    trade_df = future.result()
+                except Exception as e:
+                    logging.error(f"Error fetching trades for {base}/{counter}: {e}")
+                    continue
+                if trade_df.empty:
+                    continue
+                for crypto_pair, trades in ((f"{base}/{counter}", trade_df), (f"{counter}/{base}", invert_trades(trade_df))):
+                    ohlc = trades_to_ohlc(trades, self.interval)
+                    candles[crypto_pair] = ohlc.iloc[-self.num_points:].reset_index()
+        return candles
+
+    def evaluate(self, candles):
+        """
+        Rank the latest signal of every strategy on every pair.
+
+        Parameters:
+        - candles: Dict mapping pairs to OHLC DataFrames (see fetch_candles)
+
+        Returns:
+        - DataFrame with SCAN_COLUMNS, actionable signals first, strongest first
+        """
+        crypto_pairs = [crypto_pair for crypto_pair in self.pairs() if crypto_pair in candles]
+        if not crypto_pairs:
+            return pd.DataFrame(columns=SCAN_COLUMNS)
+
+        # Right-align each pair's candles so the last column is its newest candle, for every
+        # candle column the strategies read (and the close, which the table shows)
+        columns = {}
+        for column in compile_strategies(self.strategies).columns | {'close'}:
+            values = np.full((len(crypto_pairs), self.num_points), np.nan)
+            for row, crypto_pair in enumerate(crypto_pairs):
+                series = candles[crypto_pair][column].to_numpy(dtype=float)[-self.num_points:]
+                if len(series):
+                    values[row, -len(series):] = series
+            columns[column] = values
+        close = columns['close']
+        updated = [candles[crypto_pair]['timestamp'].iloc[-1] for crypto_pair in crypto_pairs]
+
+        # All strategies share one compiled kernel, so common indicators are computed once
+        frames = []
+        for strategy_name, (signals, strength) in evaluate_strategies(self.strategies, columns).items():
+            frames.append(pd.DataFrame({
+                "Pair": crypto_pairs,
+                "Strategy": strategy_name,
+                "Signal": signals,
+                "Strength": strength,
+                "Close": close[:, -1],
+                "Updated": updated,
+            }))
+
+        table = pd.concat(frames, ignore_index=True)
+        table['Actionable'] = table['Signal'] != 'Hold'
+        table = table.sort_values(['Actionable', 'Strength'], ascending=[False, False], kind='stable')
+        return table[SCAN_COLUMNS].reset_index(drop=True)
+
+    def scan(self):
+        return self.evaluate(self.fetch_candles())
+
+    def run(self, on_result=None, refresh_seconds=None, iterations=None):
+        """
+        Rescan every interval (or every refresh_seconds) and hand each table to on_result.
+        """
+        refresh_seconds = refresh_seconds or pd.to_timedelta(self.interval).total_seconds()
+        iteration = 0
+        while iterations is None or iteration < iterations:
+            started = time.monotonic()
+            try:
+                table = self.scan()
+                if on_result:
+                    on_result(table)
+                else:
+                    logging.info(f"Market scan:\n{table.head(20).to_string()}")
+            except Exception as e:
+                logging.error(f"Error scanning market: {e}")
+            iteration += 1
+            if iterations is None or iteration < iterations:
+                time.sleep(max(0.0, refresh_seconds - (time.monotonic() - started)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scan every configured pair for actionable strategy signals.")
+    parser.add_argument("--network-url", default="https://horizon.stellar.org")
+    parser.add_argument("--assets", nargs="*", default=None, help="Asset codes (defaults to all tradable assets)")
+    parser.add_argument("--interval", default="1min")
+    parser.add_argument("--num-points", type=int, default=60)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--rate", type=float, default=1.0, help="Maximum Horizon requests per second (public Horizon allows 1)")
+    parser.add_argument("--once", action="store_true", help="Scan once and exit")
+    args = parser.parse_args(argv)
+
+    scanner = MarketScanner(args.network_url, assets=args.assets, interval=args.interval,
+                            num_points=args.num_points, max_workers=args.workers,
+                            requests_per_second=args.rate)
+    scanner.run(iterations=1 if args.once else None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+import logging
+from contextlib import contextmanager
+from engine.config import config
+from engine.asset_registry import get_registry
+from engine.stellar_api import trades_to_ohlc
+from engine.trading_bot import HISTORY_COLUMNS, TradingBot
+from engine.utils import lazy_import
+
+# Heavy dependencies are imported on first use to keep engine imports fast
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# Set up logging configuration
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+STROOPS_PER_XLM = 10_000_000
+FILL_COLUMNS = ["Time", "Offer", "Sell", "Buy", "Sold", "Bought", "Price"]
+
+
+class PaperTradingBot(TradingBot):
+    """
+    Drop-in TradingBot that executes against replayed market data instead of Horizon.
+
+    Orders follow the semantics of the operations TradingBot.place_order submits:
+    - buy=True is a ManageBuyOffer selling the base asset to buy `amount` of the counter asset
+      at `price` base per counter
+    - buy=False is a ManageSellOffer selling `amount` of the counter asset for the base asset
+      at `price` base per counter
+
+    Offers first cross the current order book snapshot (if one was provided), then rest and
+    fill against replayed trades, possibly partially. Every submission pays the network fee
+    (base_fee stroops in XLM) and fills pay `fee_rate` of the received amount.
+
+    Parameters:
+    - balances: Dict of initial balances by asset code, e.g. {"XLM": 1000, "USDC": 100}
+    - fee_rate: Proportional fee applied to the proceeds of every fill
+    - journal: Optional EventJournal, which also records fills
+    """
+    def __init__(self, balances, fee_rate=0.0, journal=None):
+        self.config = config
+        self.registry = get_registry()
+        self.journal = journal
+        self._journaled_history = None
+        self.balances = {asset_code: float(balance) for asset_code, balance in balances.items()}
+        self.fee_rate = fee_rate
+        self.now = None
+        self.offers = {}
+        self.order_book = None
+        self.history = []
+        self.rejected = []
+        self.fills = []
+        self._history_df = None
+        self.fees_paid = 0.0
+        self._next_offer_id = 1
+
+    def get_balances(self):
+        return [
+            {'Asset': asset_code, 'Balance': balance}
+            for asset_code, balance in self.balances.items()
+            if asset_code in self.registry.pinned_issuers()
+        ]
+
+    def fetch_trading_history(self):
+        # do_exchange asks for the history after every step, so only rebuild it when it grew
+        if self._history_df is None or len(self._history_df) != len(self.history):
+            self._history_df = pd.DataFrame(self.history, columns=HISTORY_COLUMNS)
+        return self._history_df
+
+    def fills_frame(self):
+        return pd.DataFrame(self.fills, columns=FILL_COLUMNS)
+
+    def _reserved(self, asset_code):
+        # Selling liabilities of open offers, which Stellar keeps out of the spendable balance
+        return sum(offer['liability'] for offer in self.offers.values() if offer['selling'] == asset_code)
+
+    def _reject(self, result_code, order_seq=None, **order):
+        self.rejected.append({"Time": self.now, "Result": result_code, **order})
+        self._record("submit", order=order_seq, successful=False, error=result_code)
+        logging.error(f"Error placing order: {result_code}")
+
+    def place_order(self, base_asset_code, counter_asset_code, amount, price, buy=True, base_fee=10000, signal=None,
+                    base_issuer=None, counter_issuer=None):
+        amount, price = float(amount), float(price)
+        order = dict(base=base_asset_code, counter=counter_asset_code, amount=amount, price=price, buy=buy)
+        order['order_seq'] = self._record("order", **order, base_fee=base_fee, signal=signal, at=self.now)
+        if amount <= 0 or price <= 0:
+            self._reject("op_malformed", **order)
+            return None
+
+        network_fee = base_fee / STROOPS_PER_XLM
+        if self.balances.get("XLM", 0.0) - self._reserved("XLM") < network_fee:
+            self._reject("tx_insufficient_balance", **order)
+            return None
+        # Like on the network, the fee is charged even if the operation then fails
+        self.balances["XLM"] -= network_fee
+        self.fees_paid += network_fee
+
+        selling, buying = (base_asset_code, counter_asset_code) if buy else (counter_asset_code, base_asset_code)
+        liability = amount * price if buy else amount
+        if self.balances.get(selling, 0.0) - self._reserved(selling) < liability:
+            self._reject("op_underfunded", **order)
+            return None
+
+        offer_id = self._next_offer_id
+        self._next_offer_id += 1
+        offer = {
+            'id': offer_id,
+            'base': base_asset_code,
+            'counter': counter_asset_code,
+            'buy': buy,
+            'selling': selling,
+            'buying': buying,
+            'remaining': amount,  # In counter asset units
+            'price': price,  # Base asset per counter asset
+            'liability': liability,
+        }
+        self.offers[offer_id] = offer
+        self.history.append({
+            "Time": self.now,
+            "Sell": selling,
+            "Buy": buying,
+            "Amount": amount,
+            "Price": price,
+            "Total": amount * price,
+        })
+
+        response = {'successful': True, 'hash': f"sim-{offer_id:016x}", 'offer_id': offer_id, 'created_at': self.now}
+        self._record("submit", order=order['order_seq'], successful=True, hash=response['hash'], offer_id=offer_id)
+
+        if self.order_book is not None:
+            self._cross_order_book(offer)
+
+        return response
+
+    def set_order_book(self, bids, asks):
+        """
+        Provide an order book snapshot for the base/counter pair that new offers cross on submit.
+
+        Parameters:
+        - bids, asks: Lists of (price, base_amount) levels, priced in counter asset per base asset
+        """
+        self.order_book = {
+            'bids': sorted(bids, key=lambda level: -level[0]),
+            'asks': sorted(asks, key=lambda level: level[0]),
+        }
+
+    def _cross_order_book(self, offer):
+        # Buying counter means selling base into the bids; selling counter means lifting the asks
+        side = 'bids' if offer['buy'] else 'asks'
+        levels = self.order_book[side]
+        for index, (level_price, base_amount) in enumerate(levels):
+            if offer['remaining'] <= 0 or base_amount <= 0:
+                continue
+            crossing = 1 / level_price <= offer['price'] if offer['buy'] else 1 / level_price >= offer['price']
+            if not crossing:
+                break
+            quantity = min(offer['remaining'], base_amount * level_price)
+            self._fill(offer, quantity, 1 / level_price)
+            levels[index] = (level_price, base_amount - quantity / level_price)
+
+    def _fill(self, offer, quantity, fill_price):
+        """
+        Execute `quantity` counter units of an offer at `fill_price` base per counter.
+        """
+        base_amount = quantity * fill_price
+        if offer['buy']:
+            sold, bought = base_amount, quantity * (1 - self.fee_rate)
+            offer['liability'] -= quantity * offer['price']
+        else:
+            sold, bought = quantity, base_amount * (1 - self.fee_rate)
+            offer['liability'] -= quantity
+        self.balances[offer['selling']] = self.balances.get(offer['selling'], 0.0) - sold
+        self.balances[offer['buying']] = self.balances.get(offer['buying'], 0.0) + bought
+        offer['remaining'] -= quantity
+        fill = {
+            "Time": self.now,
+            "Offer": offer['id'],
+            "Sell": offer['selling'],
+            "Buy": offer['buying'],
+            "Sold": sold,
+            "Bought": bought,
+            "Price": fill_price,
+        }
+        self.fills.append(fill)
+        self._record("fill", **fill)
+        if offer['remaining'] <= 1e-12:
+            del self.offers[offer['id']]
+
+    def match_trades(self, base_asset_code, counter_asset_code, timestamps, prices, base_volumes):
+        """
+        Fill resting offers of a pair against a batch of replayed trades.
+
+        Offers are matched in price-then-time priority: the best priced offer, and the oldest
+        among equally priced ones, takes from the volume of every crossing trade first, in
+        trade order, and later offers only get what is left of each trade.
+
+        Parameters:
+        - timestamps: Array of trade times
+        - prices: Array of trade prices in counter asset per base asset
+        - base_volumes: Array of traded base asset amounts
+        """
+        if len(prices) == 0:
+            return
+        market_prices = 1 / np.asarray(prices, dtype=float)  # Base per counter
+        counter_volumes = np.asarray(base_volumes, dtype=float) * np.asarray(prices, dtype=float)
+
+        offers = [offer for offer in self.offers.values() if offer['base'] == base_asset_code and offer['counter'] == counter_asset_code]
+        # Buy offers paying the most and sell offers asking the least come first, then the oldest
+        offers.sort(key=lambda offer: (not offer['buy'], -offer['price'] if offer['buy'] else offer['price'], offer['id']))
+        for offer in offers:
+            crossing = market_prices <= offer['price'] if offer['buy'] else market_prices >= offer['price']
+            available = np.where(crossing, counter_volumes, 0.0)
+            cumulative = np.cumsum(available)
+            if cumulative.size == 0 or cumulative[-1] <= 0:
+                continue
+            quantity = min(offer['remaining'], cumulative[-1])
+            # Consume the liquidity this offer took from each trade
+            counter_volumes = counter_volumes - np.clip(quantity - (cumulative - available), 0.0, available)
+            self.now = timestamps[min(int(np.searchsorted(cumulative, quantity)), len(timestamps) - 1)]
+            self._fill(offer, quantity, offer['price'])
+
+@contextmanager
+def _quiet(enabled):
+    if enabled:
+        logging.disable(logging.ERROR)
+    try:
+        yield
+    finally:
+        if enabled:
+            logging.disable(logging.NOTSET)
+
+
+def replay(bot, trade_df, crypto_pair, trading_strategy, interval="1min", num_points=50, quiet=True):
+    """
+    Run TradingBot.do_exchange over recorded trades at accelerated time.
+
+    At the close of every candle the bot sees the last num_points candles, exactly as
+    fetch_exchange_data would return them, and its resting offers are then matched
+    against the trades of the following candle.
+
+    Parameters:
+    - bot: PaperTradingBot
+    - trade_df: DataFrame of trades with 'timestamp', 'price' and 'volume' columns
+      (e.g. engine.backfill.load_trades output)
+    - crypto_pair: Trading pair in the format "BASE/QUOTE"
+    - trading_strategy: TradingStrategy instance
+    - interval: Candle interval
+    - num_points: Number of candles handed to the strategy at each step
+    - quiet: Silence logging during the replay (rejected orders stay in bot.rejected)
+
+    Returns:
+    - DataFrame with the timestamp and balances after every step
+    """
+    base_asset_code, counter_asset_code = crypto_pair.split('/')
+    candles = trades_to_ohlc(trade_df, interval).reset_index()
+    if candles.empty:
+        return pd.DataFrame(columns=['timestamp'])
+
+    trade_df = trade_df.sort_values('timestamp', kind='stable')
+    trade_times = pd.DatetimeIndex(pd.to_datetime(trade_df['timestamp'], utc=True))
+    prices = trade_df['price'].to_numpy(dtype=float)
+    volumes = trade_df['volume'].to_numpy(dtype=float)
+
+    candle_ends = pd.DatetimeIndex(candles['timestamp']) + pd.to_timedelta(interval)
+    # Trades of candle i+1 lie between boundaries[i] and boundaries[i + 1]
+    boundaries = trade_times.searchsorted(candle_ends, side='left')
+
+    snapshots = []
+    with _quiet(quiet):
+        for i in range(len(candles)):
+            bot.now = candle_ends[i]
+            price_df = candles.iloc[max(0, i + 1 - num_points):i + 1].copy()
+            bot.do_exchange(base_asset_code, counter_asset_code, price_df, bot.get_balances(), trading_strategy)
+
+            if i + 1 < len(candles):
+                lo, hi = boundaries[i], boundaries[i + 1]
+                bot.match_trades(base_asset_code, counter_asset_code, trade_times[lo:hi], prices[lo:hi], volumes[lo:hi])
+            snapshots.append({'timestamp': candle_ends[i], **bot.balances})
+
+    return pd.DataFrame(snapshots)
+
+
+def main(argv=None):
+    import argparse
+    from engine.backfill import load_trades
+    from engine.journal import EventJournal
+    from engine.strategies import TradingStrategy, list_strategies
+
+    parser = argparse.ArgumentParser(description="Replay backfilled trades through the paper-trading bot.")
+    parser.add_argument("--pair", default="XLM/USDC")
+    parser.add_argument("--trades", default="data/trades", help="Backfill output directory")
+    parser.add_argument("--start", default=None)
+    parser.add_argument("--end", default=None)
+    parser.add_argument("--strategy", default=list_strategies()[0], choices=list_strategies())
+    parser.add_argument("--interval", default="1min")
+    parser.add_argument("--num-points", type=int, default=50)
+    parser.add_argument("--balances", nargs="*", default=["XLM=10000", "USDC=1000"], help="Initial balances as CODE=AMOUNT")
+    parser.add_argument("--fee-rate", type=float, default=0.0)
+    parser.add_argument("--journal", default=None, help="Record the replay's events in this journal directory")
+    args = parser.parse_args(argv)
+
+    balances = {code: float(amount) for code, amount in (item.split('=') for item in args.balances)}
+    journal = EventJournal(args.journal) if args.journal else None
+    bot = PaperTradingBot(balances, fee_rate=args.fee_rate, journal=journal)
+    trade_df = load_trades(args.trades, args.pair, args.start, args.end)
+    snapshots = replay(bot, trade_df, args.pair, TradingStrategy(args.strategy), interval=args.interval, num_points=args.num_points)
+    if journal is not None:
+        journal.close()
+
+    logging.info(f"Replayed {len(snapshots)} candles: {len(bot.history)} orders, {len(bot.fills)} fills, {len(bot.rejected)} rejected.")
+    logging.info(f"Final balances: {bot.balances}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,111 @@
-import yaml
-import pandas as pd
 from datetime import datetime, timedelta
-from stellar_sdk import Server, Asset
 import logging
 import pytz
+from engine.asset_registry import get_registry, network_for_url
+from engine.utils import lazy_import
+
+# Heavy dependencies are imported on first use to keep engine imports fast
+pd = lazy_import("pandas")
+stellar_sdk = lazy_import("stellar_sdk")
 
 # Set up logging configuration
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# Load configuration
-with open("config/config.yaml", "r") as file:
-    config = yaml.safe_load(file)
+
+def get_asset(asset_code, network="mainnet"):
+    """
+    Memoized stellar_sdk Asset for an asset code, using the issuer pinned for the network or
+    else the most held issuer in the network's local asset catalog.
+    """
+    return get_registry(network).get_asset(asset_code)
+
+
+def parse_trade(trade):
+    """
+    Convert a Horizon trade record into a flat dict of timestamp, price, amount and volume.
+    """
+    timestamp = datetime.strptime(trade['ledger_close_time'], "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=pytz.utc)
+    price = float(trade['price']['n']) / float(trade['price']['d'])
+    amount = float(trade.get('base_amount', 0))
+    volume = float(trade.get('base_amount', 0))
+    return {'timestamp': timestamp, 'price': price, 'amount': amount, 'volume': volume}
+
+
+def trades_to_ohlc(trade_df, interval):
+    """
+    Aggregate a DataFrame of trades (timestamp, price, volume) into OHLC candles.
+
+    Parameters:
+    - trade_df: DataFrame with 'timestamp', 'price' and 'volume' columns
+    - interval: Time interval for resampling (e.g., "1min", "1h")
+
+    Returns:
+    - DataFrame indexed by timestamp with open, high, low, close and volume columns
+    """
+    df = trade_df.set_index('timestamp').sort_index()
+
+    ohlc = df['price'].resample(interval).ohlc()
+    volume = df['volume'].resample(interval).sum()
+    ohlc['volume'] = volume
+
+    ohlc['open'] = ohlc['close'].shift(1)
+    ohlc['open'] = ohlc['open'].ffill()
+    ohlc['open'] = ohlc['open'].fillna(ohlc['close'])
+
+    return ohlc
+
+
+def fetch_trades(server, base_asset, counter_asset, start_time, rate_limiter=None):
+    """
+    Page backward through the trades of an asset pair until start_time.
+
+    Parameters:
+    - server: stellar_sdk Server
+    - base_asset, counter_asset: stellar_sdk Assets of the pair
+    - start_time: Timezone-aware datetime of the oldest trade to include
+    - rate_limiter: Optional RateLimiter shared with other workers; requests are then throttled
+      and retried on rate limiting
+
+    Returns:
+    - List of trade dicts (see parse_trade), newest first
+    """
+    all_trade_data = []
+    cursor = None
+    stop_fetching = False  # Flag to stop fetching once we go beyond the start time
+    while not stop_fetching:
+        # Fetch a maximum of 200 trades per request (API limit)
+        trades_request = server.trades().for_asset_pair(base=base_asset, counter=counter_asset).order(desc=True).limit(200)
+        if cursor:
+            trades_request = trades_request.cursor(cursor)
+
+        trades = rate_limiter.call(trades_request.call) if rate_limiter else trades_request.call()
+
+        trade_data = []
+        for trade in trades['_embedded']['records']:
+            record = parse_trade(trade)
+            
+            if record['timestamp'] < start_time:  # Stop if the trade is older than the start time
+                stop_fetching = True
+                break  # Break the inner loop, but outer loop will terminate due to flag
+            
+            trade_data.append(record)
+
+        all_trade_data.extend(trade_data)
+        
+        if len(trades['_embedded']['records']) < 200:  # Break if fewer than 200 trades returned
+            break
+        
+        cursor = trades['_embedded']['records'][-1]['paging_token']  # Update the cursor for the next request
+
+    return all_trade_data
 
 
 def fetch_exchange_data(network_url="https://horizon.stellar.org", 
                      crypto_pair="XLM/USDC", 
                      interval="1min", 
-                     num_points=20):
+                     num_points=20,
+                     server=None,
+                     rate_limiter=None):
     """
     Fetch historical trade data from Stellar Horizon API and aggregate into OHLC.
 
@@ -25,20 +114,23 @@ def fetch_exchange_data(network_url="https://horizon.stellar.org",
     - crypto_pair: Trading pair in the format "BASE/QUOTE"
     - interval: Time interval for resampling (e.g., "1m", "5m", "15m", "1h", "1d", "1w")
     - num_points: Number of intervals (candlesticks) to display
+    - server: Optional stellar_sdk Server to reuse (one is created for network_url otherwise)
+    - rate_limiter: Optional RateLimiter shared with other callers (see fetch_trades)
 
     Returns:
     - DataFrame with OHLC data
     """
-    server = Server(network_url)
+    server = server or stellar_sdk.Server(network_url)
 
     logging.info(f"Fetching trade data for pair: {crypto_pair}, interval: {interval}, num_points: {num_points}")
 
     base_asset_code, counter_asset_code = crypto_pair.split('/')
     logging.info(f"Base asset: {base_asset_code}, Counter asset: {counter_asset_code}")
 
-    base_asset = Asset.native() if base_asset_code == "XLM" else Asset(base_asset_code, config['asset_issuers'].get(base_asset_code))
+    network = network_for_url(network_url)
+    base_asset = get_asset(base_asset_code, network)
     print(counter_asset_code)
-    counter_asset = Asset.native() if counter_asset_code == "XLM" else Asset(counter_asset_code, config['asset_issuers'].get(counter_asset_code))
+    counter_asset = get_asset(counter_asset_code, network)
 
     try:
         interval_duration = pd.to_timedelta(interval)
@@ -47,53 +139,14 @@ def fetch_exchange_data(network_url="https://horizon.stellar.org",
 
         logging.info(f"Fetching trades for {base_asset_code}/{counter_asset_code} from {start_time} to {end_time}")
 
-        all_trade_data = []
-        cursor = None
-        stop_fetching = False  # Flag to stop fetching once we go beyond the start time
-        while not stop_fetching:
-            # Fetch a maximum of 200 trades per request (API limit)
-            trades_request = server.trades().for_asset_pair(base=base_asset, counter=counter_asset).order(desc=True).limit(200)
-            if cursor:
-                trades_request = trades_request.cursor(cursor)
-
-            trades = trades_request.call()
-
-            trade_data = []
-            for trade in trades['_embedded']['records']:
-                timestamp = datetime.strptime(trade['ledger_close_time'], "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=pytz.utc)
-                
-                if timestamp < start_time:  # Stop if the trade is older than the start time
-                    stop_fetching = True
-                    break  # Break the inner loop, but outer loop will terminate due to flag
-                
-                price = float(trade['price']['n']) / float(trade['price']['d'])
-                amount = float(trade.get('base_amount', 0))
-                volume = float(trade.get('base_amount', 0))
-                trade_data.append({'timestamp': timestamp, 'price': price, 'amount': amount, 'volume': volume})
-
-            all_trade_data.extend(trade_data)
-            
-            if len(trades['_embedded']['records']) < 200:  # Break if fewer than 200 trades returned
-                break
-            
-            cursor = trades['_embedded']['records'][-1]['paging_token']  # Update the cursor for the next request
+        all_trade_data = fetch_trades(server, base_asset, counter_asset, start_time, rate_limiter)
 
         if not all_trade_data:
             logging.warning("No trades found.")
             return pd.DataFrame(columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
 
         logging.info(f"Processing {len(all_trade_data)} trades.")
-        df = pd.DataFrame(all_trade_data)
-        df.set_index('timestamp', inplace=True)
-        df.sort_index(inplace=True)
-
-        ohlc = df['price'].resample(interval).ohlc()
-        volume = df['volume'].resample(interval).sum()
-        ohlc['volume'] = volume
-
-        ohlc['open'] = ohlc['close'].shift(1)
-        ohlc['open'] = ohlc['open'].ffill()
-        ohlc['open'] = ohlc['open'].fillna(ohlc['close'])
+        ohlc = trades_to_ohlc(pd.DataFrame(all_trade_data), interval)
 
         if len(ohlc) > num_points:
             ohlc = ohlc.iloc[-num_points:]
@@ -1,88 +1,418 @@
-import numpy as np
-import pandas as pd
+import ast
+import json
+import itertools
+import threading
+from engine.config import config
+from engine.utils import lazy_import
 
-strategy_names = [
-    "Moving Average",
-    "Moving Average Crossover",
-    "Mean Reversion"
-]
+# Heavy dependencies are imported on first use to keep engine imports fast
+np = lazy_import("numpy")
 
-class TradingStrategy:
-    def __init__(self, strategy_name):
-        self.strategy_name = strategy_name
+# Strategy definitions. Each one declares:
+# - params: Default parameter values, usable by name in every expression
+# - indicators: Named expressions over the candle columns (open, high, low, close, volume),
+#   the params and earlier indicators; they are also written to the DataFrame by apply()
+# - rules: [condition, signal] pairs, the first matching condition decides the signal
+# - default: Signal when no rule matches
+# - strength: How far the latest candle is past its decision threshold (used by the scanner)
+# Indicator functions: sma, std, lowest, highest (rolling over a window), shift and abs.
+# More definitions can be added under `strategies` in config.yaml.
+STRATEGIES = {
+    "Moving Average": {
+        # Buy when price is lower than the moving average, sell when it's higher
+        "params": {"window": 20},
+        "indicators": {"SMA": "sma(close, window)"},
+        "rules": [["close > SMA", "Sell"]],
+        "default": "Buy",
+        "strength": "abs(close / SMA - 1)",
+    },
+    "Moving Average Crossover": {
+        # Buy while the short-term moving average is above the long-term one, sell otherwise
+        "params": {"short_window": 20, "long_window": 50},
+        "indicators": {"SMA_short": "sma(close, short_window)", "SMA_long": "sma(close, long_window)"},
+        "rules": [["SMA_short > SMA_long", "Buy"]],
+        "default": "Sell",
+        "strength": "abs(SMA_short / SMA_long - 1)",
+    },
+    "Mean Reversion": {
+        # Buy when the Z-score is below -z_threshold, sell when it is above z_threshold
+        "params": {"window": 20, "z_threshold": 1.5},
+        "indicators": {
+            "Rolling_Mean": "sma(close, window)",
+            "Rolling_Std": "std(close, window)",
+            "Z_Score": "(close - Rolling_Mean) / Rolling_Std",
+        },
+        "rules": [["Z_Score > z_threshold", "Sell"], ["Z_Score < -z_threshold", "Buy"]],
+        "default": "Hold",
+        "strength": "abs(Z_Score)",
+    },
+}
 
-    def apply(self, price_df):
-        """
-        Apply a defined strategy to decide when to buy or sell.
-        """
-        if self.strategy_name == "Moving Average":
-            return self.apply_moving_average_strategy(price_df)
-        elif self.strategy_name == "Moving Average Crossover":
-            return self.apply_moving_average_crossover_strategy(price_df)
-        elif self.strategy_name == "Mean Reversion":
-            return self.apply_mean_reversion_strategy(price_df)
-        else:
-            raise ValueError(f"Unknown strategy: {self.strategy_name}")
-
-    def apply_moving_average_strategy(self, price_df, window=20):
-        """
-        Apply a simple moving average strategy to decide when to buy or sell.
-        Buy when price is lower than the moving average, sell when it's higher.
-        """
-        # Ensure the DataFrame contains the necessary columns
-        required_columns = ['timestamp', 'open', 'high', 'low', 'close']
-        if not all(col in price_df.columns for col in required_columns):
-            raise ValueError(f"DataFrame must contain columns: {required_columns}")
+strategy_names = list(STRATEGIES)
 
-        # Apply the moving average (SMA)
-        price_df['SMA'] = price_df['close'].rolling(window=window).mean()
+CANDLE_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+SIGNALS = ('Hold', 'Buy', 'Sell')  # Signal codes 0, 1 and -1 index into this tuple
+SIGNAL_CODES = {'Hold': 0, 'Buy': 1, 'Sell': -1}
+WINDOW_FUNCTIONS = ('sma', 'std', 'lowest', 'highest', 'shift')
+OPERATORS = {
+    ast.Add: ('add', '+'), ast.Sub: ('sub', '-'), ast.Mult: ('mul', '*'), ast.Div: ('div', '/'),
+    ast.Gt: ('gt', '>'), ast.GtE: ('ge', '>='), ast.Lt: ('lt', '<'), ast.LtE: ('le', '<='),
+    ast.BitAnd: ('and', '&'), ast.BitOr: ('or', '|'), ast.And: ('and', '&'), ast.Or: ('or', '|'),
+}
 
-        # Generate buy/sell signals: Buy when close < SMA, Sell when close > SMA
-        price_df['Signal'] = np.where(price_df['close'] > price_df['SMA'], 'Sell', 'Buy')
 
-        return price_df
+def strategy_definitions():
+    """
+    Built-in strategy definitions merged with the ones under `strategies` in config.yaml.
+    """
+    return {**STRATEGIES, **(config.get('strategies') or {})}
+
+
+def list_strategies():
+    return list(strategy_definitions())
+
+
+def parameter_grid(strategy_name, **param_values):
+    """
+    One strategy variant per combination of parameter values, for compile_strategies.
+
+    Example: parameter_grid("Mean Reversion", window=[10, 20], z_threshold=[1.0, 1.5, 2.0])
+
+    Returns:
+    - List of (label, strategy_name, params)
+    """
+    names = list(param_values)
+    variants = []
+    for values in itertools.product(*(param_values[name] for name in names)):
+        params = dict(zip(names, values))
+        label = f"{strategy_name}({', '.join(f'{name}={value}' for name, value in params.items())})"
+        variants.append((label, strategy_name, params))
+    return variants
+
+
+def _rolling(values, window, reducer):
+    # NaN until a full window is available, and wherever the window contains NaN (like pandas rolling)
+    result = np.full(values.shape, np.nan)
+    if window <= values.shape[-1]:
+        windows = np.lib.stride_tricks.sliding_window_view(values, window, axis=-1)
+        result[..., window - 1:] = reducer(windows)
+    return result
+
+
+def _sma(values, window):
+    return _rolling(values, window, lambda windows: windows.mean(axis=-1))
+
+
+def _std(values, window):
+    return _rolling(values, window, lambda windows: windows.std(axis=-1, ddof=1))
+
+
+def _lowest(values, window):
+    return _rolling(values, window, lambda windows: windows.min(axis=-1))
+
+
+def _highest(values, window):
+    return _rolling(values, window, lambda windows: windows.max(axis=-1))
+
+
+def _shift(values, periods):
+    result = np.full(values.shape, np.nan)
+    if periods < values.shape[-1]:
+        result[..., periods:] = values[..., :values.shape[-1] - periods]
+    return result
+
+
+class _Parser:
+    """
+    Turns the expressions of one strategy variant into canonical trees, e.g.
+    "sma(close, window)" with window=20 becomes ('sma', ('col', 'close'), 20). Equal trees
+    are computed once per kernel, however many strategies or variants use them.
+    """
+    def __init__(self, label, params):
+        self.label = label
+        self.params = params
+        self.indicators = {}
+
+    def parse(self, expression):
+        try:
+            tree = ast.parse(str(expression), mode='eval').body
+        except SyntaxError as e:
+            raise ValueError(f"{self.label}: invalid expression {expression!r}: {e.msg}")
+        return self._node(tree, expression)
+
+    def _constant(self, node, expression):
+        if node[0] != 'const':
+            raise ValueError(f"{self.label}: window of {expression!r} must be a number or parameter")
+        if node[1] != int(node[1]) or node[1] < 0:
+            raise ValueError(f"{self.label}: window of {expression!r} must be a non-negative integer")
+        return int(node[1])
+
+    def _node(self, tree, expression):
+        if isinstance(tree, ast.Constant) and isinstance(tree.value, (int, float)) and not isinstance(tree.value, bool):
+            return ('const', float(tree.value))
+        if isinstance(tree, ast.Name):
+            if tree.id in CANDLE_COLUMNS:
+                return ('col', tree.id)
+            if tree.id in self.indicators:
+                return self.indicators[tree.id]
+            if tree.id in self.params:
+                return ('const', float(self.params[tree.id]))
+            raise ValueError(f"{self.label}: unknown name {tree.id!r} in {expression!r}")
+        if isinstance(tree, ast.UnaryOp) and isinstance(tree.op, (ast.USub, ast.UAdd)):
+            operand = self._node(tree.operand, expression)
+            if isinstance(tree.op, ast.UAdd):
+                return operand
+            return ('const', -operand[1]) if operand[0] == 'const' else ('neg', operand)
+        if isinstance(tree, ast.BinOp) and type(tree.op) in OPERATORS:
+            return (OPERATORS[type(tree.op)][0], self._node(tree.left, expression), self._node(tree.right, expression))
+        if isinstance(tree, ast.BoolOp) and type(tree.op) in OPERATORS:
+            nodes = [self._node(value, expression) for value in tree.values]
+            return self._fold(OPERATORS[type(tree.op)][0], nodes)
+        if isinstance(tree, ast.Compare) and all(type(op) in OPERATORS for op in tree.ops):
+            # a < b < c means (a < b) & (b < c)
+            operands = [self._node(tree.left, expression)] + [self._node(value, expression) for value in tree.comparators]
+            nodes = [(OPERATORS[type(op)][0], left, right) for op, left, right in zip(tree.ops, operands, operands[1:])]
+            return self._fold('and', nodes)
+        if isinstance(tree, ast.Call) and isinstance(tree.func, ast.Name) and not tree.keywords:
+            name, args = tree.func.id, tree.args
+            if name == 'abs' and len(args) == 1:
+                return ('abs', self._node(args[0], expression))
+            if name in WINDOW_FUNCTIONS and len(args) == 2:
+                window = self._constant(self._node(args[1], expression), expression)
+                if name != 'shift' and window < 1:
+                    raise ValueError(f"{self.label}: window of {expression!r} must be at least 1")
+                return (name, self._node(args[0], expression), window)
+        raise ValueError(f"{self.label}: unsupported expression {expression!r}")
+
+    @staticmethod
+    def _fold(operator, nodes):
+        node = nodes[0]
+        for other in nodes[1:]:
+            node = (operator, node, other)
+        return node
+
+
+class StrategyKernel:
+    """
+    Compiled signals of several strategy variants, generated as one NumPy function.
+
+    Every distinct indicator (e.g. one 20-period SMA of the close, whichever strategies use
+    it) is computed once per call. Candle columns may be 1D (one series) or 2D (one series
+    per row, oldest to newest), so one call evaluates many strategies, parameter sets and
+    series together.
 
-    def apply_moving_average_crossover_strategy(self, price_df, short_window=20, long_window=50):
+    - labels: Variant labels in output order
+    - columns: Candle columns the kernel reads
+    - source: Generated Python source of the kernel
+    """
+    def __init__(self, variants):
+        self.labels = []
+        self.columns = set()
+        self.indicator_names = {}
+        lines = []
+        names = {}
+
+        def emit(node):
+            kind = node[0]
+            if kind == 'const':
+                return repr(node[1])
+            if node in names:
+                return names[node]
+            if kind == 'col':
+                self.columns.add(node[1])
+                code = f"columns[{node[1]!r}]"
+            elif kind in WINDOW_FUNCTIONS:
+                code = f"_{kind}({emit(node[1])}, {node[2]})"
+            elif kind == 'abs':
+                code = f"np.abs({emit(node[1])})"
+            elif kind == 'neg':
+                code = f"-{emit(node[1])}"
+            else:
+                symbol = next(symbol for name, symbol in OPERATORS.values() if name == kind)
+                code = f"({emit(node[1])} {symbol} {emit(node[2])})"
+            names[node] = f"v{len(names)}"
+            lines.append(f"{names[node]} = {code}")
+            return names[node]
+
+        outputs = []
+        for label, definition, params in variants:
+            parser = _Parser(label, {**definition.get('params', {}), **(params or {})})
+            for indicator, expression in definition.get('indicators', {}).items():
+                parser.indicators[indicator] = parser.parse(expression)
+
+            conditions, codes = [], []
+            for condition, signal in definition.get('rules', []):
+                if signal not in SIGNAL_CODES:
+                    raise ValueError(f"{label}: unknown signal {signal!r}")
+                conditions.append(emit(parser.parse(condition)))
+                codes.append(str(SIGNAL_CODES[signal]))
+            default = SIGNAL_CODES[definition.get('default', 'Hold')]
+            strength = emit(parser.parse(definition['strength'])) if definition.get('strength') else "0.0"
+            indicators = {indicator: emit(node) for indicator, node in parser.indicators.items()}
+
+            signal = f"np.select([{', '.join(conditions)}], [{', '.join(codes)}], {default})" if conditions else str(default)
+            outputs.append(f"({signal}, {strength}, {{{', '.join(f'{name!r}: {var}' for name, var in indicators.items())}}})")
+            self.labels.append(label)
+            self.indicator_names[label] = list(indicators)
+
+        body = "\n".join(f"        {line}" for line in lines)
+        self.source = (
+            "def kernel(columns):\n"
+            "    with np.errstate(divide='ignore', invalid='ignore'):\n"
+            f"{body}\n"
+            f"        return ({', '.join(outputs)},)\n"
+        )
+        namespace = {'np': np, '_sma': _sma, '_std': _std, '_lowest': _lowest, '_highest': _highest, '_shift': _shift}
+        exec(compile(self.source, "<strategy kernel>", "exec"), namespace)
+        self._kernel = namespace['kernel']
+
+    def __call__(self, columns):
         """
-        Apply a moving average crossover strategy.
-        Buy when short-term moving average crosses above long-term moving average.
-        Sell when short-term moving average crosses below long-term moving average.
+        Evaluate every variant.
+
+        Parameters:
+        - columns: Dict of candle column arrays (at least self.columns), all of the same shape
+
+        Returns:
+        - Dict mapping labels to (signal codes, strength, {indicator: values}) arrays
         """
-        # Ensure the DataFrame contains the necessary columns
-        required_columns = ['timestamp', 'open', 'high', 'low', 'close']
-        if not all(col in price_df.columns for col in required_columns):
-            raise ValueError(f"DataFrame must contain columns: {required_columns}")
+        columns = {name: np.asarray(columns[name], dtype=float) for name in self.columns}
+        shape = next(iter(columns.values())).shape if columns else ()
+        results = {}
+        for label, (signal, strength, indicators) in zip(self.labels, self._kernel(columns)):
+            results[label] = (
+                np.broadcast_to(np.asarray(signal, dtype=np.int8), shape),
+                np.broadcast_to(strength, shape),
+                {name: np.broadcast_to(values, shape) for name, values in indicators.items()},
+            )
+        return results
 
-        # Short-term and long-term moving averages
-        price_df['SMA_short'] = price_df['close'].rolling(window=short_window).mean()  # short-term SMA
-        price_df['SMA_long'] = price_df['close'].rolling(window=long_window).mean()  # long-term SMA
 
-        # Generate buy/sell signals
-        price_df['Signal'] = np.where(price_df['SMA_short'] > price_df['SMA_long'], 'Buy', 'Sell')
+_kernels = {}
+_kernels_lock = threading.Lock()
+
+
+def compile_strategies(variants):
+    """
+    Compile strategy variants into one StrategyKernel (memoized).
+
+    Parameters:
+    - variants: Strategy names, or (label, strategy name or definition dict, params) tuples
+
+    Returns:
+    - StrategyKernel
+    """
+    definitions = None
+    resolved = []
+    for variant in variants:
+        label, strategy, params = (variant, variant, None) if isinstance(variant, str) else variant
+        if isinstance(strategy, str):
+            definitions = definitions if definitions is not None else strategy_definitions()
+            if strategy not in definitions:
+                raise ValueError(f"Unknown strategy: {strategy}")
+            strategy = definitions[strategy]
+        resolved.append((label, strategy, params or {}))
+
+    key = json.dumps(resolved, sort_keys=True, default=str)
+    with _kernels_lock:
+        kernel = _kernels.get(key)
+    if kernel is None:
+        kernel = StrategyKernel(resolved)
+        with _kernels_lock:
+            _kernels[key] = kernel
+    return kernel
+
+
+def signal_labels(codes):
+    """
+    Convert signal codes (1, -1, 0) into 'Buy'/'Sell'/'Hold' labels.
+    """
+    return np.array(SIGNALS)[np.asarray(codes, dtype=np.int8)]
 
-        return price_df
 
-    def apply_mean_reversion_strategy(self, price_df, window=20, z_threshold=1.5):
+class TradingStrategy:
+    def __init__(self, strategy_name, params=None, definition=None):
+        """
+        Parameters:
+        - strategy_name: Name of a strategy definition (see strategy_definitions)
+        - params: Optional overrides of the definition's parameters
+        - definition: Optional definition to use instead of looking the name up (e.g. one
+          recorded in the journal)
+        """
+        self.strategy_name = strategy_name
+        self.params = params or {}
+        self._definition = definition
+
+    @property
+    def definition(self):
         """
-        Apply a mean reversion strategy.
-        Buy when Z-score is below -z_threshold (i.e., price is below mean).
-        Sell when Z-score is above z_threshold (i.e., price is above mean).
+        Definition the strategy runs with, resolved once so later config edits don't change it.
         """
+        if self._definition is None:
+            definitions = strategy_definitions()
+            if self.strategy_name not in definitions:
+                raise ValueError(f"Unknown strategy: {self.strategy_name}")
+            self._definition = definitions[self.strategy_name]
+        return self._definition
+
+    def apply(self, price_df):
+        """
+        Apply a defined strategy to decide when to buy or sell.
+
+        Adds the strategy's indicator columns and a 'Signal' column ('Buy', 'Sell' or 'Hold').
+        """
+        kernel = compile_strategies([(self.strategy_name, self.definition, self.params)])
+
         # Ensure the DataFrame contains the necessary columns
-        required_columns = ['timestamp', 'open', 'high', 'low', 'close']
+        required_columns = ['timestamp', *sorted(kernel.columns)]
         if not all(col in price_df.columns for col in required_columns):
             raise ValueError(f"DataFrame must contain columns: {required_columns}")
 
-        # Calculate rolling mean and standard deviation
-        price_df['Rolling_Mean'] = price_df['close'].rolling(window=window).mean()
-        price_df['Rolling_Std'] = price_df['close'].rolling(window=window).std()
+        signal, _, indicators = kernel({column: price_df[column].to_numpy(dtype=float) for column in kernel.columns})[self.strategy_name]
+        for name, values in indicators.items():
+            price_df[name] = values
+        price_df['Signal'] = signal_labels(signal)
 
-        # Calculate Z-score
-        price_df['Z_Score'] = (price_df['close'] - price_df['Rolling_Mean']) / price_df['Rolling_Std']
+        return price_df
 
-        # Generate buy/sell signals based on Z-score thresholds
-        price_df['Signal'] = np.where(price_df['Z_Score'] > z_threshold, 'Sell',
-                                np.where(price_df['Z_Score'] < -z_threshold, 'Buy', 'Hold'))
 
-        return price_df
+def evaluate_strategies(strategies, columns):
+    """
+    Latest signal of several strategies for the newest candle of many series, in one kernel call.
+
+    Parameters:
+    - strategies: Strategy names (or variants, see compile_strategies)
+    - columns: Dict of 2D candle column arrays (at least compile_strategies(strategies).columns),
+      one row per series, oldest to newest, left-padded with NaN. A single 2D array is taken
+      as the close prices.
+
+    Returns:
+    - Dict mapping labels to (signals, strength): arrays of 'Buy'/'Sell'/'Hold' and of how far
+      each series is past its decision threshold
+    """
+    if not isinstance(columns, dict):
+        columns = {'close': columns}
+    kernel = compile_strategies(strategies)
+    missing = kernel.columns - set(columns)
+    if missing:
+        raise ValueError(f"Strategies need candle columns: {sorted(missing)}")
+
+    columns = {column: np.asarray(columns[column], dtype=float) for column in kernel.columns}
+    for column, values in columns.items():
+        if values.shape[1] == 0:
+            columns[column] = np.full((values.shape[0], 1), np.nan)
+    results = kernel(columns)
+    return {
+        label: (signal_labels(signal[:, -1]), np.nan_to_num(strength[:, -1], nan=0.0, posinf=0.0))
+        for label, (signal, strength, _) in results.items()
+    }
+
+
+def evaluate_latest(strategy_name, close):
+    """
+    Vectorized counterpart of TradingStrategy.apply for the newest candle of many series at once.
 
+    Returns:
+    - (signals, strength) as in evaluate_strategies
+    """
+    return evaluate_strategies([strategy_name], close)[strategy_name]
@@ -1,37 +1,54 @@
-import yaml
-import requests
 import logging
-import numpy as np
-import pandas as pd
-from stellar_sdk import Server, Keypair, TransactionBuilder, Network, Asset, ManageBuyOffer, ManageSellOffer
-from stellar_sdk.exceptions import BadRequestError, ConnectionError, NotFoundError
+from engine.config import config
+from engine.asset_registry import HORIZON_URLS, get_registry
+from engine.utils import lazy_import
+
+# Heavy dependencies are imported on first use to keep engine imports fast
+pd = lazy_import("pandas")
+stellar_sdk = lazy_import("stellar_sdk")
+stellar_sdk_exceptions = lazy_import("stellar_sdk.exceptions")
 
 # Set up logging configuration
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# Load configuration
-with open("config/config.yaml", "r") as file:
-    config = yaml.safe_load(file)
+HISTORY_COLUMNS = ["Time", "Sell", "Buy", "Amount", "Price", "Total"]
+OFFER_COLUMNS = ["Offer", "Sell", "Buy", "Amount", "Price"]
 
 class TradingBot:
-    def __init__(self, stellar_key, network="testnet"):
-        self.keypair = Keypair.from_secret(stellar_key)
+    def __init__(self, stellar_key, network="testnet", server=None, load_account=True, journal=None):
+        """
+        Parameters:
+        - stellar_key: Secret key of the trading account
+        - network: "testnet" or "mainnet"
+        - server: Optional stellar_sdk Server to share (e.g. one pooled client for many accounts)
+        - load_account: Load the account right away; otherwise call load_account() later
+        - journal: Optional EventJournal recording candles, signals, orders and submit results
+        """
+        self.keypair = stellar_sdk.Keypair.from_secret(stellar_key)
         self.config = config  # Use the loaded config
+        self.network = network
+        self.journal = journal
+        self._journaled_history = None
 
         # Initialize the server and network passphrase
         if network == "testnet":
-            self.server = Server(horizon_url="https://horizon-testnet.stellar.org")
-            self.network_passphrase = Network.TESTNET_NETWORK_PASSPHRASE
+            self.network_passphrase = stellar_sdk.Network.TESTNET_NETWORK_PASSPHRASE
         elif network == "mainnet":
-            self.server = Server(horizon_url="https://horizon.stellar.org")
-            self.network_passphrase = Network.PUBLIC_NETWORK_PASSPHRASE
+            self.network_passphrase = stellar_sdk.Network.PUBLIC_NETWORK_PASSPHRASE
         else:
             raise ValueError("Unsupported network. Please choose 'testnet' or 'mainnet'.")
+        self.server = server or stellar_sdk.Server(horizon_url=HORIZON_URLS[network])
+        self.registry = get_registry(network)
+
+        self.account = None
+        if load_account:
+            self.load_account()
 
+    def load_account(self):
         try:
             self.account = self.server.load_account(self.keypair.public_key)
             logging.info("Successfully loaded account.")
-        except NotFoundError as e:
+        except stellar_sdk_exceptions.NotFoundError as e:
             logging.error("The Stellar account was not found. Check the Stellar Key or the network.")
             raise e
     
@@ -41,13 +58,13 @@ class TradingBot:
             balances = account['balances']
 
             balance_data = []
-            asset_issuers = self.config.get('asset_issuers', {})
+            asset_issuers = self.registry.pinned_issuers()
 
             for asset_code, asset_issuer in asset_issuers.items():
                 for balance in balances:
                     # print(balance)
                     current_asset_code = "XLM" if balance['asset_type'] == 'native' else balance.get('asset_code', 'Unknown')
-                    current_asset_issuer = balance.get('asset_issuer', 'Stellar Foundation')
+                    current_asset_issuer = balance.get('asset_issuer')
 
                     if current_asset_code == asset_code and current_asset_issuer == asset_issuer:
                         # price, change_24h = utils.get_asset_price_and_change(current_asset_code.lower())
@@ -62,7 +79,7 @@ class TradingBot:
                             # 'Change (24h)': change_24h
                         })
 
-            logging.info(f"Fetched balances: {pd.DataFrame(balance_data)}")
+            logging.info("Fetched balances: %s", balance_data)
             return balance_data
 
         except Exception as e:
@@ -71,60 +88,83 @@ class TradingBot:
 
     def fetch_trading_history(self):
         try:
-            transactions = self.server.transactions().for_account(self.keypair.public_key).limit(200).order(desc=True).call()
+            # One request for the account's latest operations instead of one per transaction
+            operations = self.server.operations().for_account(self.keypair.public_key).limit(200).order(desc=True).call()
             trades = []
 
-            for transaction in transactions['_embedded']['records']:
-                operations = self.server.operations().for_transaction(transaction['id']).call()['_embedded']['records']
-                
-                for operation in operations:
-                    if operation['type'] in ['manage_buy_offer', 'manage_sell_offer']:
-                        action = "Buy" if operation['type'] == 'manage_buy_offer' else "Sell"
-                        buy_asset = operation.get('buying_asset_code', 'XLM')
-                        sell_asset = operation.get('selling_asset_code', 'XLM')
-                        amount = float(operation.get('amount', 0))
-                        price = float(operation.get('price', 0))
-                        total = amount * price
-
-                        trades.append({
-                            "Time": transaction['created_at'],
-                            "Sell": sell_asset,
-                            "Buy": buy_asset,
-                            "Amount": amount,
-                            "Price": price,
-                            "Total": total
-                        })
+            for operation in operations['_embedded']['records']:
+                if operation['type'] in ['manage_buy_offer', 'manage_sell_offer']:
+                    buy_asset = operation.get('buying_asset_code', 'XLM')
+                    sell_asset = operation.get('selling_asset_code', 'XLM')
+                    amount = float(operation.get('amount', 0))
+                    price = float(operation.get('price', 0))
+                    total = amount * price
 
-            trades_df = pd.DataFrame(trades) if trades else pd.DataFrame(columns=["Time", "Sell", "Buy", "Amount", "Price", "Total"])
-            logging.info(f"Fetched trades: {trades_df}")
+                    trades.append({
+                        "Time": operation['created_at'],
+                        "Sell": sell_asset,
+                        "Buy": buy_asset,
+                        "Amount": amount,
+                        "Price": price,
+                        "Total": total
+                    })
+
+            trades_df = pd.DataFrame(trades) if trades else pd.DataFrame(columns=HISTORY_COLUMNS)
+            logging.info("Fetched trades: %s", trades_df)
             return trades_df
 
         except Exception as e:
             logging.error(f"Error fetching trading history: {e}")
-            return pd.DataFrame(columns=["Time", "Sell", "Buy", "Amount", "Price", "Total"])
-
+            return pd.DataFrame(columns=HISTORY_COLUMNS)
 
-    def place_order(self, base_asset_code, counter_asset_code, amount, price, buy=True, base_fee=10000):
+    def fetch_offers(self):
         try:
-            base_issuer = self.config['asset_issuers'].get(base_asset_code)
-            counter_issuer = self.config['asset_issuers'].get(counter_asset_code)
+            offers = self.server.offers().for_account(self.keypair.public_key).limit(200).call()
+
+            open_offers = [{
+                "Offer": offer['id'],
+                "Sell": offer['selling'].get('asset_code', 'XLM'),
+                "Buy": offer['buying'].get('asset_code', 'XLM'),
+                "Amount": float(offer['amount']),
+                "Price": float(offer['price']),
+            } for offer in offers['_embedded']['records']]
+
+            return pd.DataFrame(open_offers, columns=OFFER_COLUMNS)
+
+        except Exception as e:
+            logging.error(f"Error fetching offers: {e}")
+            return pd.DataFrame(columns=OFFER_COLUMNS)
 
-            base_asset = Asset.native() if base_asset_code == "XLM" else Asset(base_asset_code, base_issuer)
-            counter_asset = Asset.native() if counter_asset_code == "XLM" else Asset(counter_asset_code, counter_issuer)
+
+    def place_order(self, base_asset_code, counter_asset_code, amount, price, buy=True, base_fee=10000, signal=None,
+                    base_issuer=None, counter_issuer=None):
+        """
+        Submit a buy or sell offer.
+
+        Assets are only traded with an issuer pinned for the bot's network (see
+        AssetRegistry.pinned_issuers) or passed explicitly as base_issuer/counter_issuer.
+        """
+        order_seq = self._record(
+            "order", base=base_asset_code, counter=counter_asset_code, amount=float(amount), price=float(price),
+            buy=buy, base_fee=base_fee, signal=signal
+        )
+        try:
+            base_asset = self.registry.trading_asset(base_asset_code, base_issuer)
+            counter_asset = self.registry.trading_asset(counter_asset_code, counter_issuer)
 
             transaction = (
-                TransactionBuilder(
+                stellar_sdk.TransactionBuilder(
                     source_account=self.account,
                     network_passphrase=self.network_passphrase,
                     base_fee=base_fee
                 )
                 .append_operation(
-                    ManageBuyOffer(
+                    stellar_sdk.ManageBuyOffer(
                         selling=base_asset,
                         buying=counter_asset,
                         amount=str(amount),
                         price=str(price)
-                    ) if buy else ManageSellOffer(
+                    ) if buy else stellar_sdk.ManageSellOffer(
                         selling=counter_asset,
                         buying=base_asset,
                         amount=str(amount),
@@ -137,65 +177,128 @@ class TradingBot:
 
             transaction.sign(self.keypair)
             response = self.server.submit_transaction(transaction)
+            self._record("submit", order=order_seq, successful=response.get('successful', True), hash=response.get('hash'))
             logging.info(f"Order placed: {response}")
             return response
 
         except Exception as e:
+            self._record("submit", order=order_seq, successful=False, error=str(e))
             logging.error(f"Error placing order: {e}")
+            self._resync_account()
             return None
 
+    def _resync_account(self):
+        # build() already advanced the local sequence number; if the transaction never reached
+        # the ledger every later order would fail with tx_bad_seq, so reload it from Horizon
+        if self.account is None:
+            return
+        try:
+            self.load_account()
+        except Exception as e:
+            logging.error(f"Error reloading the account after a failed order: {e}")
+
     def do_exchange(self, base_asset_code, counter_asset_code, price_df, balances, trading_strategy):
         try:
             # Ensure price_df is a DataFrame
             if not isinstance(price_df, pd.DataFrame):
                 raise ValueError("price_df should be a pandas DataFrame")
 
-            # Apply the moving average strategy
-            price_df = trading_strategy.apply(price_df)
-
-            # Get the latest trading signal
-            latest_signal = price_df.iloc[-1]['Signal']
-            latest_price = price_df.iloc[-1]['close']
-
-            # Fetch the available balance for the base asset
-            base_balance = next((item['Balance'] for item in balances if item['Asset'] == base_asset_code), 0)
-            counter_balance = next((item['Balance'] for item in balances if item['Asset'] == counter_asset_code), 0)
-
-            # Define the trade amount and price
-            amount = min(float(base_balance) * 0.1, 100)  # Example: Use 10% of the balance or a maximum of 100
-            if amount <= 0:
-                logging.warning("Insufficient balance to trade.")
-                return
-
-            # Execute the trade based on the signal
-            if latest_signal == 'Buy':
-                # Buy counter_asset using base_asset
-                if base_balance > 0:
-                    response = self.place_order(
-                        base_asset_code=base_asset_code,
-                        counter_asset_code=counter_asset_code,
-                        amount=amount,
-                        price=latest_price,
-                        buy=True
-                    )
-                    if response:
-                        logging.info(f"Buy order placed: {response}")
-            elif latest_signal == 'Sell':
-                # Sell base_asset to get counter_asset
-                if counter_balance > 0:
-                    response = self.place_order(
-                        base_asset_code=base_asset_code,
-                        counter_asset_code=counter_asset_code,
-                        amount=amount,
-                        price=latest_price,
-                        buy=False
-                    )
-                    if response:
-                        logging.info(f"Sell order placed: {response}")
+            crypto_pair = f"{base_asset_code}/{counter_asset_code}"
+            candles_seq = self._record_candles(crypto_pair, price_df)
+
+            # Apply the strategy and size the order for the latest signal
+            decision = decide(base_asset_code, counter_asset_code, price_df, balances, trading_strategy)
+            signal_seq = self._record(
+                "signal", pair=crypto_pair, strategy=trading_strategy.strategy_name,
+                params=trading_strategy.params, definition=trading_strategy.definition, candles=candles_seq,
+                balances=balances, **decision
+            )
+
+            if decision['buy'] is None:
+                if decision['amount'] <= 0:
+                    logging.warning("Insufficient balance to trade.")
+                    return
+            else:
+                # buy=True buys counter_asset using base_asset, buy=False sells counter_asset for base_asset
+                response = self.place_order(
+                    base_asset_code=base_asset_code,
+                    counter_asset_code=counter_asset_code,
+                    amount=decision['amount'],
+                    price=decision['price'],
+                    buy=decision['buy'],
+                    signal=signal_seq
+                )
+                if response:
+                    logging.info(f"{decision['signal']} order placed: {response}")
 
             # Update trading history
             trades_df = self.fetch_trading_history()
-            logging.info(f"Updated trading history: {trades_df}")
+            self._record_history(trades_df)
+            logging.info("Updated trading history: %s", trades_df)
 
         except Exception as e:
-            logging.error(f"Error in do_exchange: {e}")
\ No newline at end of file
+            logging.error(f"Error in do_exchange: {e}")
+
+    def _record(self, event_type, **fields):
+        """
+        Append an event to the bot's journal, if it has one.
+
+        Returns:
+        - Sequence number of the event, or None without a journal
+        """
+        if self.journal is None:
+            return None
+        return self.journal.append(event_type, **fields)
+
+    def _record_candles(self, crypto_pair, price_df):
+        if self.journal is None:
+            return None
+        timestamp = pd.DatetimeIndex(pd.to_datetime(price_df['timestamp'], utc=True)).as_unit('ns').asi8
+        columns = {column: price_df[column].tolist() for column in ('open', 'high', 'low', 'close', 'volume') if column in price_df.columns}
+        return self._record("candles", pair=crypto_pair, timestamp=timestamp.tolist(), **columns)
+
+    def _record_history(self, trades_df):
+        # Only rows that are new since the last snapshot are journaled
+        if self.journal is None or trades_df.empty:
+            return
+        times = trades_df['Time'].astype(str)
+        new_rows = trades_df[times > self._journaled_history] if self._journaled_history else trades_df
+        if not new_rows.empty:
+            self._record("history", trades=new_rows.astype({'Time': str}).to_dict('records'))
+            self._journaled_history = times.max()
+
+
+def decide(base_asset_code, counter_asset_code, price_df, balances, trading_strategy):
+    """
+    Trading decision for the latest candle, as executed by TradingBot.do_exchange.
+
+    Parameters:
+    - price_df: OHLC DataFrame (the strategy adds its columns to it)
+    - balances: List of {'Asset', 'Balance'} dicts as returned by get_balances
+    - trading_strategy: TradingStrategy instance
+
+    Returns:
+    - Dict with the signal, the latest close price, the order amount and buy (True for a buy
+      order, False for a sell order, None if no order is placed)
+    """
+    # Apply the strategy
+    price_df = trading_strategy.apply(price_df)
+
+    # Get the latest trading signal
+    latest_signal = str(price_df.iloc[-1]['Signal'])
+    latest_price = float(price_df.iloc[-1]['close'])
+
+    # Fetch the available balance for the base asset
+    base_balance = next((item['Balance'] for item in balances if item['Asset'] == base_asset_code), 0)
+    counter_balance = next((item['Balance'] for item in balances if item['Asset'] == counter_asset_code), 0)
+
+    # Define the trade amount and price
+    amount = min(float(base_balance) * 0.1, 100)  # Example: Use 10% of the balance or a maximum of 100
+    buy = None
+    if amount > 0:
+        if latest_signal == 'Buy' and base_balance > 0:
+            buy = True
+        elif latest_signal == 'Sell' and counter_balance > 0:
+            buy = False
+
+    return {'signal': latest_signal, 'price': latest_price, 'amount': amount, 'buy': buy}
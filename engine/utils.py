@@ -1,18 +1,46 @@
-import yaml
-import requests
+import time
+import importlib
+import threading
 import logging
 
 # Set up logging configuration
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 
+class LazyModule:
+    """
+    Stand-in for a module that is only imported on first attribute access.
+
+    Keeps heavy dependencies (pandas, numpy, stellar_sdk, ...) out of the import path of
+    engine modules until a function actually needs them.
+    """
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attr):
+        value = getattr(importlib.import_module(self._name), attr)
+        setattr(self, attr, value)  # Later lookups skip __getattr__
+        return value
+
+    def __repr__(self):
+        return f"<lazy module '{self._name}'>"
+
+
+def lazy_import(name):
+    return LazyModule(name)
+
+
 def load_config(config_path):
+    import yaml
+
     with open(config_path, 'r') as file:
         config = yaml.safe_load(file)
     return config
 
 
 def get_usdc_price_and_change():
+    import requests
+
     try:
         url = f"https://api.coingecko.com/api/v3/simple/price?ids=usd-coin&vs_currencies=usd&include_24hr_change=true"
         response = requests.get(url).json()
@@ -26,3 +54,61 @@ def get_usdc_price_and_change():
     except Exception as e:
         logging.error(f"Error fetching price for usd-coin: {e}")
         return 0.0, 0.0
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket shared by concurrent workers hitting the Horizon API.
+
+    Parameters:
+    - rate: Sustained number of requests allowed per second
+    - burst: Number of requests that may be issued back to back before throttling
+    """
+    def __init__(self, rate=10.0, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Block until a request token is available.
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def call(self, request, retries=4, backoff=1.0):
+        """
+        Issue a Horizon request once a token is available, retrying rate-limited (429),
+        server-side (5xx) and connection failures with exponential backoff.
+
+        Parameters:
+        - request: Callable issuing the request
+        - retries: Number of retries before the last error is raised
+        - backoff: Seconds to wait before the first retry, doubled on each further retry
+
+        Returns:
+        - The request's result
+        """
+        from stellar_sdk.exceptions import BaseHorizonError, ConnectionError
+
+        for attempt in range(retries + 1):
+            self.acquire()
+            try:
+                return request()
+            except (BaseHorizonError, ConnectionError) as e:
+                status = getattr(e, 'status', None)
+                if attempt == retries or (status is not None and status != 429 and status < 500):
+                    raise
+                wait = backoff * 2 ** attempt
+                logging.warning(f"Horizon request failed ({status or e}), retrying in {wait:.0f}s.")
+                time.sleep(wait)
@@ -0,0 +1,157 @@
+import os
+import tempfile
+import unittest
+import unittest.mock
+from stellar_sdk.exceptions import ConnectionError
+from engine.asset_registry import HORIZON_URLS, AssetRegistry, build_asset, get_registry
+
+USDC_ISSUER = "GA5ZSEJYB37JRC5AVCIA5MOP4RHTM335X2KGX3IHOJAPP5RE34K4KZVN"
+AQUA_ISSUER = "GBNZILSTVQZ4R7IKQDGHYGY2QXL5QOFJYQMXPKWRRM5PAV7Y4M67AQUA"
+FAKE_AQUA_ISSUER = "GDSTRSHXHGJ7ZIVRBXEYE5Q74XUVCUSEKEBR7UCHEUUEK72N7I7KJ6JH"
+
+
+def asset_record(code, issuer, holders, paging_token):
+    return {
+        'asset_type': 'credit_alphanum4',
+        'asset_code': code,
+        'asset_issuer': issuer,
+        'paging_token': paging_token,
+        'accounts': {'authorized': holders},
+        'balances': {'authorized': '1000.0'},
+        '_links': {'toml': {'href': f"https://{code.lower()}.example.com/.well-known/stellar.toml"}},
+    }
+
+
+class FakeAssetsCall:
+    def __init__(self, server):
+        self.server = server
+        self.code = None
+        self.cursor_value = None
+        self.page_size = 200
+
+    def for_code(self, code):
+        self.code = code
+        return self
+
+    def limit(self, limit):
+        self.page_size = limit
+        return self
+
+    def order(self, desc=False):
+        return self
+
+    def cursor(self, cursor):
+        self.cursor_value = cursor
+        return self
+
+    def call(self):
+        self.server.calls += 1
+        if self.server.fail_after is not None and self.server.calls > self.server.fail_after:
+            raise ConnectionError("connection reset")
+        records = [record for record in self.server.records if self.code in (None, record['asset_code'])]
+        if self.cursor_value:
+            records = [record for record in records if record['paging_token'] > self.cursor_value]
+        return {'_embedded': {'records': records[:self.page_size]}}
+
+
+class FakeServer:
+    def __init__(self, records):
+        self.records = sorted(records, key=lambda record: record['paging_token'])
+        self.calls = 0
+        self.fail_after = None
+
+    def assets(self):
+        return FakeAssetsCall(self)
+
+
+class TestAssetRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        records = [asset_record(f"T{i:03d}", USDC_ISSUER, i, f"{i:06d}") for i in range(450)]
+        records += [asset_record("AQUA", AQUA_ISSUER, 90000, "900000"), asset_record("AQUA", FAKE_AQUA_ISSUER, 3, "900001")]
+        self.server = FakeServer(records)
+        self.registry = AssetRegistry(os.path.join(self.tmp_dir.name, "assets.sqlite"), requests_per_second=1e6)
+        self.registry._server = self.server
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_refresh_respects_ttl(self):
+        self.assertTrue(self.registry.is_stale())
+        self.assertEqual(self.registry.refresh(), 452)
+        self.assertEqual(self.server.calls, 3)
+        self.assertFalse(self.registry.is_stale())
+        self.assertEqual(self.registry.refresh(), 0)
+        self.assertEqual(self.server.calls, 3)
+
+    def test_interrupted_crawl_resumes_from_cursor(self):
+        self.server.fail_after = 1
+        with unittest.mock.patch('engine.utils.time.sleep') as sleep, self.assertRaises(ConnectionError):
+            self.registry.refresh()
+        # The failing page is retried with backoff before the crawl gives up
+        self.assertEqual(sleep.call_count, 4)
+        self.assertTrue(self.registry.is_stale())
+
+        self.server.fail_after = None
+        self.assertEqual(self.registry.refresh(), 252)
+        self.assertEqual(len(self.registry.lookup(limit=1000)), 452)
+
+    def test_lookup_and_resolve_prefer_most_held_issuer(self):
+        self.registry.refresh()
+        self.assertEqual([entry['issuer'] for entry in self.registry.lookup("AQUA")], [AQUA_ISSUER, FAKE_AQUA_ISSUER])
+        self.assertEqual(self.registry.lookup(asset_issuer=FAKE_AQUA_ISSUER)[0]['home_domain'], "aqua.example.com")
+        self.assertEqual(self.registry.resolve_issuer("AQUA"), AQUA_ISSUER)
+        self.assertEqual(len(self.registry.lookup(min_holders=440, limit=1000)), 11)
+
+    def test_config_pin_takes_precedence(self):
+        with unittest.mock.patch('engine.asset_registry.config', {'asset_issuers': {'AQUA': FAKE_AQUA_ISSUER}}):
+            self.assertEqual(self.registry.resolve_issuer("AQUA"), FAKE_AQUA_ISSUER)
+        self.assertEqual(self.server.calls, 0)
+
+    def test_unknown_code_is_discovered_once(self):
+        asset = self.registry.get_asset("AQUA")
+        self.assertEqual(asset.issuer, AQUA_ISSUER)
+        calls = self.server.calls
+        self.assertIs(self.registry.get_asset("AQUA"), asset)
+        self.assertEqual(self.server.calls, calls)
+        with self.assertRaises(ValueError):
+            self.registry.get_asset("NOPE")
+
+    def test_pins_make_assets_tradable(self):
+        self.registry.refresh()
+        with unittest.mock.patch('engine.asset_registry.config', {'asset_issuers': {'XLM': 'Stellar Foundation', 'USDC': USDC_ISSUER}}):
+            self.assertEqual(self.registry.asset_codes(), ["XLM", "USDC"])
+            # Unpinned codes are readable as market data but never signed for by holder count
+            self.assertEqual(self.registry.get_asset("AQUA").issuer, AQUA_ISSUER)
+            with self.assertRaises(ValueError):
+                self.registry.trading_asset("AQUA")
+            self.assertEqual(self.registry.trading_asset("AQUA", FAKE_AQUA_ISSUER).issuer, FAKE_AQUA_ISSUER)
+
+            self.assertEqual(self.registry.pin("AQUA"), AQUA_ISSUER)
+            self.assertEqual(self.registry.asset_codes(), ["XLM", "USDC", "AQUA"])
+            self.assertEqual(self.registry.trading_asset("AQUA").issuer, AQUA_ISSUER)
+            self.assertTrue(self.registry.trading_asset("XLM").is_native())
+
+        # Pins are stored in the catalog, config pins only apply to their network
+        reopened = AssetRegistry(self.registry.path, network="testnet")
+        with unittest.mock.patch('engine.asset_registry.config', {'asset_issuers': {'USDC': USDC_ISSUER}}):
+            self.assertEqual(reopened.asset_codes(), ["XLM", "AQUA"])
+
+    def test_registries_are_kept_per_network(self):
+        with unittest.mock.patch('engine.asset_registry.config', {'asset_registry': {'path': os.path.join(self.tmp_dir.name, "shared.sqlite")}}), \
+                unittest.mock.patch('engine.asset_registry._registries', {}):
+            mainnet, testnet = get_registry("mainnet"), get_registry("testnet")
+            self.assertIs(get_registry("testnet"), testnet)
+            self.assertEqual(testnet.network_url, HORIZON_URLS["testnet"])
+            self.assertNotEqual(mainnet.path, testnet.path)
+            self.assertEqual(testnet.asset_codes(), ["XLM"])
+        self.assertFalse(os.path.exists(testnet.path))
+
+    def test_build_asset_is_memoized(self):
+        self.assertIs(build_asset("USDC", USDC_ISSUER), build_asset("USDC", USDC_ISSUER))
+        self.assertTrue(build_asset("XLM", "Stellar Foundation").is_native())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,183 @@
+import os
+import tempfile
+import unittest
+import unittest.mock
+from datetime import datetime, timedelta
+import pytz
+from stellar_sdk.client.response import Response
+from stellar_sdk.exceptions import BadRequestError, BadResponseError, NotFoundError
+from engine.backfill import backfill, find_ledger_at, ledger_cursor, ledger_from_paging_token, load_trades, shard_path, split_time_range
+from engine.utils import RateLimiter
+
+GENESIS = datetime(2024, 1, 1, tzinfo=pytz.utc)
+LATEST_LEDGER = 20000
+
+
+def close_time(sequence):
+    # Ledgers close every 5 seconds, with a slower patch to keep the search honest
+    return GENESIS + timedelta(seconds=5 * sequence + (30 if sequence > 12000 else 0))
+
+
+class FakeCall:
+    def __init__(self, server, kind):
+        self.server = server
+        self.kind = kind
+        self.params = {}
+
+    def __getattr__(self, name):
+        def setter(*args, **kwargs):
+            self.params[name] = args[0] if args else kwargs
+            return self
+        return setter
+
+    def call(self):
+        self.server.calls += 1
+        if self.kind == 'ledger':
+            return {'closed_at': close_time(self.params['sequence']).strftime("%Y-%m-%dT%H:%M:%SZ")}
+        if self.kind == 'ledgers':
+            return {'_embedded': {'records': [
+                {'sequence': LATEST_LEDGER, 'closed_at': close_time(LATEST_LEDGER).strftime("%Y-%m-%dT%H:%M:%SZ")}
+            ]}}
+        cursor = self.params['cursor']
+        records = [trade for trade in self.server.trade_records if tuple(map(int, trade['paging_token'].split('-'))) > tuple(map(int, cursor.split('-')))]
+        return {'_embedded': {'records': records[:self.params['limit']]}}
+
+
+class FakeLedgers(FakeCall):
+    def ledger(self, sequence):
+        call = FakeCall(self.server, 'ledger')
+        call.params['sequence'] = sequence
+        return call
+
+
+class FakeServer:
+    def __init__(self, trade_ledgers=()):
+        self.calls = 0
+        self.trade_records = [
+            {
+                'paging_token': f"{(ledger << 32) + 4096}-0",
+                'ledger_close_time': close_time(ledger).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                'price': {'n': 1, 'd': 10},
+                'base_amount': '5.0',
+            }
+            for ledger in trade_ledgers
+        ]
+
+    def ledgers(self):
+        return FakeLedgers(self, 'ledgers')
+
+    def trades(self):
+        return FakeCall(self, 'trades')
+
+
+class TestBackfill(unittest.TestCase):
+
+    def setUp(self):
+        self.rate_limiter = RateLimiter(rate=1e6)
+
+    def test_paging_token_round_trip(self):
+        self.assertEqual(ledger_from_paging_token(ledger_cursor(51234567)), 51234567)
+
+    def test_split_time_range(self):
+        shards = split_time_range(GENESIS, GENESIS + timedelta(hours=13), timedelta(hours=6))
+        self.assertEqual(len(shards), 3)
+        self.assertEqual(shards[-1], (GENESIS + timedelta(hours=12), GENESIS + timedelta(hours=13)))
+
+    def test_find_ledger_at(self):
+        server = FakeServer()
+        for sequence in (2, 777, 11999, 12000, 12001, 15000, 19999):
+            for offset in (timedelta(0), timedelta(seconds=-1)):
+                when = close_time(sequence) + offset
+                self.assertEqual(find_ledger_at(server, when, self.rate_limiter), sequence)
+        self.assertLess(server.calls / 14, 20, "Interpolation search should need only a few probes per lookup")
+
+    def test_backfill_writes_and_resumes(self):
+        server = FakeServer(trade_ledgers=range(100, 8000, 3))
+        start_time, end_time = close_time(100), close_time(100) + timedelta(hours=12)
+
+        with tempfile.TemporaryDirectory() as out_dir, unittest.mock.patch('engine.backfill.stellar_sdk.Server', return_value=server):
+            written = backfill(start_time, end_time, out_dir=out_dir, crypto_pairs=["XLM/USDC"],
+                               shard_duration=timedelta(hours=2), requests_per_second=1e6)
+            self.assertEqual(len(written), 6)
+            self.assertEqual(sum(written.values()), len(server.trade_records))
+            self.assertEqual(len(os.listdir(os.path.join(out_dir, "XLM_USDC"))), 6)
+
+            trades = load_trades(out_dir, "XLM/USDC")
+            self.assertEqual(len(trades), len(server.trade_records))
+            self.assertTrue(trades['timestamp'].is_monotonic_increasing)
+            self.assertAlmostEqual(trades['price'].iloc[0], 0.1)
+            self.assertEqual(len(load_trades(out_dir, "XLM/USDC", "2024-01-01 01:00", "2024-01-01 02:00")), 240)
+
+            # A second run finds every shard on disk and downloads nothing
+            self.assertEqual(backfill(start_time, end_time, out_dir=out_dir, crypto_pairs=["XLM/USDC"],
+                                      shard_duration=timedelta(hours=2), requests_per_second=1e6), {})
+
+    def test_resume_with_later_end_does_not_overlap(self):
+        server = FakeServer(trade_ledgers=range(100, 8000, 3))
+        start_time = close_time(100)
+
+        with tempfile.TemporaryDirectory() as out_dir, unittest.mock.patch('engine.backfill.stellar_sdk.Server', return_value=server):
+            # The partial shard at the end of the first range is not written
+            written = backfill(start_time, start_time + timedelta(hours=5), out_dir=out_dir, crypto_pairs=["XLM/USDC"],
+                               shard_duration=timedelta(hours=2), requests_per_second=1e6)
+            self.assertEqual(len(written), 2)
+
+            written = backfill(start_time, start_time + timedelta(hours=11, minutes=30), out_dir=out_dir, crypto_pairs=["XLM/USDC"],
+                               shard_duration=timedelta(hours=2), requests_per_second=1e6)
+            self.assertEqual(len(written), 3)
+            trades = load_trades(out_dir, "XLM/USDC")
+            self.assertEqual(len(trades), sum(1 for ledger in range(100, 8000, 3) if close_time(ledger) < start_time + timedelta(hours=10)))
+            self.assertTrue(trades['paging_token'].is_unique)
+
+            # Overlapping shards left by older runs are read once
+            shard_duration = timedelta(hours=2)
+            with open(shard_path(out_dir, "XLM/USDC", start_time, start_time + shard_duration), 'rb') as source, \
+                    open(shard_path(out_dir, "XLM/USDC", start_time, start_time + timedelta(hours=1)), 'wb') as target:
+                target.write(source.read())
+            self.assertEqual(len(load_trades(out_dir, "XLM/USDC")), len(trades))
+
+            # Shards that end after the newest ledger closed are not written either
+            written = backfill(start_time, close_time(LATEST_LEDGER) + timedelta(hours=6), out_dir=out_dir, crypto_pairs=["XLM/USDC"],
+                               shard_duration=shard_duration, requests_per_second=1e6)
+            self.assertEqual(len(written), (close_time(LATEST_LEDGER) - start_time) // shard_duration - 5)
+
+    def test_rate_limited_requests_are_retried(self):
+        def error(error_class, status):
+            return error_class(Response(status, "", {}, "https://horizon.stellar.org/trades"))
+
+        request = unittest.mock.Mock(side_effect=[error(BadRequestError, 429), error(BadResponseError, 503), "ok"])
+        with unittest.mock.patch('engine.utils.time.sleep') as sleep:
+            self.assertEqual(self.rate_limiter.call(request, backoff=1.0), "ok")
+            self.assertEqual([call.args[0] for call in sleep.call_args_list], [1.0, 2.0])
+
+            request = unittest.mock.Mock(side_effect=error(NotFoundError, 404))
+            with self.assertRaises(NotFoundError):
+                self.rate_limiter.call(request)
+            self.assertEqual(request.call_count, 1)
+
+            request = unittest.mock.Mock(side_effect=error(BadRequestError, 429))
+            with self.assertRaises(BadRequestError):
+                self.rate_limiter.call(request, retries=2)
+            self.assertEqual(request.call_count, 3)
+
+    def test_failed_boundaries_skip_their_shards(self):
+        server = FakeServer(trade_ledgers=range(100, 8000, 3))
+        start_time, end_time = close_time(100), close_time(100) + timedelta(hours=12)
+        boundary = start_time + timedelta(hours=4)
+
+        def find_ledger(server, when, rate_limiter, latest=None):
+            if when == boundary:
+                raise ConnectionError("boundary lookup failed")
+            return find_ledger_at(server, when, rate_limiter, latest)
+
+        with tempfile.TemporaryDirectory() as out_dir, \
+                unittest.mock.patch('engine.backfill.stellar_sdk.Server', return_value=server), \
+                unittest.mock.patch('engine.backfill.find_ledger_at', side_effect=find_ledger):
+            written = backfill(start_time, end_time, out_dir=out_dir, crypto_pairs=["XLM/USDC"],
+                               shard_duration=timedelta(hours=2), requests_per_second=1e6)
+        # The shards ending and starting at the failed boundary are left for the next run
+        self.assertEqual(len(written), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
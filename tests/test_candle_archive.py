@@ -0,0 +1,136 @@
+import tempfile
+import unittest
+import unittest.mock
+import numpy as np
+import pandas as pd
+from engine import candle_archive
+from engine.candle_archive import CandleArchive
+
+
+def make_candles(start, periods, freq="1min"):
+    timestamps = pd.date_range(start, periods=periods, freq=freq, tz="UTC")
+    close = np.arange(periods, dtype=float) + 1
+    return pd.DataFrame({
+        'timestamp': timestamps,
+        'open': close - 0.5,
+        'high': close + 1,
+        'low': close - 1,
+        'close': close,
+        'volume': np.full(periods, 10.0),
+    })
+
+
+def as_utc(value):
+    timestamp = pd.Timestamp(value)
+    return timestamp if timestamp.tzinfo else timestamp.tz_localize("UTC")
+
+
+class TestCandleArchive(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.archive = CandleArchive(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_append_is_incremental(self):
+        candles = make_candles("2024-01-01", 3000)
+        self.assertEqual(self.archive.append("XLM/USDC", "1min", candles.iloc[:1500]), 1500)
+        # Overlapping candles are skipped, only the newer ones are appended
+        self.assertEqual(self.archive.append("XLM/USDC", "1min", candles.iloc[1000:]), 1500)
+        self.assertEqual(self.archive.append("XLM/USDC", "1min", candles), 0)
+        self.assertEqual(self.archive.count("XLM/USDC", "1min"), 3000)
+        self.assertEqual(list(self.archive.series()), [("XLM/USDC", "1min")])
+
+    def test_append_discards_torn_writes(self):
+        candles = make_candles("2024-01-01", 1030)
+        self.archive.append("XLM/USDC", "1min", candles.iloc[:1020])
+        # An append interrupted before the timestamp file was written leaves stray values behind
+        path = self.archive._path("XLM/USDC", "1min")
+        for column in ('open', 'high', 'low', 'close'):
+            with open(self.archive._column_file(path, column), 'ab') as file:
+                file.write(np.full(3, -1.0, dtype='<f8').tobytes())
+        with open(self.archive._column_file(path, 'index'), 'ab') as file:
+            file.write(np.full(1, -1, dtype='<i8').tobytes())
+
+        self.assertEqual(self.archive.append("XLM/USDC", "1min", candles.iloc[1020:1022]), 2)
+        frame = self.archive.read("XLM/USDC", "1min").to_frame()
+        for column in ('open', 'high', 'low', 'close', 'volume'):
+            np.testing.assert_array_equal(frame[column].to_numpy(), candles[column].to_numpy()[:1022], column)
+
+        self.archive.append("XLM/USDC", "1min", candles.iloc[1022:])
+        window = self.archive.read("XLM/USDC", "1min", candles['timestamp'].iloc[1025])
+        self.assertEqual(window['close'][0], 1026.0)
+
+    def test_read_time_range_is_zero_copy(self):
+        candles = make_candles("2024-01-01", 5000)
+        self.archive.append("XLM/USDC", "1min", candles)
+
+        window = self.archive.read("XLM/USDC", "1min", "2024-01-02 00:00", "2024-01-02 01:00")
+        self.assertEqual(len(window), 60)
+        self.assertIsInstance(window['close'], np.memmap)
+        self.assertEqual(window['close'][0], 1441.0)
+
+        frame = window.to_frame()
+        self.assertEqual(list(frame.columns), ['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+        self.assertEqual(frame['timestamp'].iloc[0], pd.Timestamp("2024-01-02", tz="UTC"))
+
+    def test_read_bounds_match_searchsorted(self):
+        candles = make_candles("2024-01-01", 4500, freq="7min")
+        self.archive.append("XLM/USDC", "7min", candles.iloc[:2000])
+        self.archive.append("XLM/USDC", "7min", candles.iloc[2000:])
+        timestamps = candles['timestamp']
+        for start, end in [(None, None), (timestamps.iloc[1024], timestamps.iloc[2048]),
+                           (timestamps.iloc[5] + pd.Timedelta("1min"), timestamps.iloc[4499] + pd.Timedelta("1min")),
+                           ("2023-01-01", "2030-01-01")]:
+            window = self.archive.read("XLM/USDC", "7min", start, end)
+            expected = candles
+            if start is not None:
+                expected = expected[(expected['timestamp'] >= as_utc(start)) & (expected['timestamp'] < as_utc(end))]
+            np.testing.assert_array_equal(window['close'], expected['close'].to_numpy())
+
+    def test_tail_and_empty(self):
+        self.assertEqual(len(self.archive.tail("XLM/USDC", "1h", 10)), 0)
+        self.archive.append("XLM/USDC", "1h", make_candles("2024-01-01", 50, freq="1h"))
+        self.assertEqual(list(self.archive.tail("XLM/USDC", "1h", 3)['close']), [48.0, 49.0, 50.0])
+
+    def test_archive_backfill_holds_back_last_candle(self):
+        trade_df = pd.DataFrame({
+            'timestamp': pd.date_range("2024-01-01", periods=10, freq="30s", tz="UTC"),
+            'price': np.linspace(1, 2, 10),
+            'volume': np.ones(10),
+        })
+        with unittest.mock.patch('engine.backfill.load_trades', return_value=trade_df):
+            appended = candle_archive.archive_backfill("unused", self.tmp_dir.name, intervals=("1min",), crypto_pairs=["XLM/USDC"])
+        self.assertEqual(appended, {("XLM/USDC", "1min"): 4})
+        self.assertEqual(self.archive.count("XLM/USDC", "1min"), 4)
+
+    def test_load_candles_only_fetches_the_gap(self):
+        candles = make_candles(pd.Timestamp.now(tz="UTC").floor("1min") - pd.Timedelta("999min"), 1000)
+        self.archive.append("XLM/USDC", "1min", candles.iloc[:990])
+        with unittest.mock.patch('engine.candle_archive.fetch_exchange_data', return_value=candles.iloc[-11:].reset_index(drop=True)) as fetch:
+            price_df = candle_archive.load_candles("XLM/USDC", "1min", 500, archive=self.archive)
+
+        self.assertLessEqual(fetch.call_args.kwargs['num_points'], 12)
+        self.assertEqual(len(price_df), 500)
+        np.testing.assert_array_equal(price_df['close'].to_numpy(), candles['close'].to_numpy()[-500:])
+
+        with unittest.mock.patch('engine.candle_archive.fetch_exchange_data', return_value=candles) as fetch:
+            candle_archive.load_candles("XLM/USDC", "1h", 500, archive=self.archive)
+        self.assertEqual(fetch.call_args.kwargs['num_points'], 500)
+
+    def test_max_window_needs_a_recent_archive(self):
+        self.assertEqual(candle_archive.max_window("XLM/USDC", "1min", archive=self.archive), candle_archive.MAX_LIVE_POINTS)
+
+        now = pd.Timestamp.now(tz="UTC").floor("1min")
+        self.archive.append("XLM/USDC", "1min", make_candles(now - pd.Timedelta("5009min"), 5000))
+        # 5000 archived candles plus the 10 after the newest one (11 if a minute just turned)
+        self.assertIn(candle_archive.max_window("XLM/USDC", "1min", archive=self.archive), (5010, 5011))
+        # An archive that stops too long ago does not extend the window
+        self.archive.append("XLM/USDC", "1h", make_candles(now - pd.Timedelta("3000h"), 1000, freq="1h"))
+        self.assertEqual(candle_archive.max_window("XLM/USDC", "1h", archive=self.archive), candle_archive.MAX_LIVE_POINTS)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import time
+import unittest
+import numpy as np
+import pandas as pd
+from engine.charts import ChartState, bucket_width, downsample_ohlc
+
+
+def make_candles(start, periods, freq="1min", seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, periods))
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    return pd.DataFrame({
+        'timestamp': pd.date_range(start, periods=periods, freq=freq, tz="UTC"),
+        'open': open_,
+        'high': np.maximum(open_, close) + 0.5,
+        'low': np.minimum(open_, close) - 0.5,
+        'close': close,
+        'volume': np.full(periods, 2.0),
+        'Signal': np.where(rng.random(periods) > 0.5, 'Buy', 'Sell'),
+    })
+
+
+class TestCharts(unittest.TestCase):
+
+    def test_bucket_width(self):
+        self.assertEqual(bucket_width(100, 800), 1)
+        self.assertEqual(bucket_width(801, 800), 2)
+        self.assertEqual(bucket_width(50000, 800), 64)
+
+    def test_downsampling_preserves_extremes_and_volume(self):
+        candles = make_candles("2024-01-01", 10000)
+        candles.loc[4321, 'high'] = 1000.0
+        candles.loc[777, 'low'] = -1000.0
+        state = ChartState(max_points=500)
+        state.update(candles)
+
+        buckets = state.buckets
+        self.assertEqual(state.width, 32)
+        self.assertLessEqual(len(buckets['timestamp']), 500)
+        self.assertEqual(buckets['high'].max(), 1000.0)
+        self.assertEqual(buckets['low'].min(), -1000.0)
+        self.assertEqual(buckets['volume'].sum(), 20000.0)
+        self.assertEqual(buckets['open'][0], candles['open'].iloc[0])
+        self.assertEqual(buckets['close'][-1], candles['close'].iloc[-1])
+        mid = (candles['open'] + candles['close']) / 2
+        self.assertEqual(buckets['line_y'].max(), mid.max())
+        self.assertEqual(buckets['line_y'].min(), mid.min())
+
+    def test_incremental_update_matches_full_downsampling(self):
+        candles = make_candles("2024-01-01", 3000)
+        state = ChartState(max_points=200)
+        state.update(candles.iloc[:2000], key="XLM/USDC")
+
+        # The last candle is still forming when first seen and is replaced later
+        forming = candles.iloc[1000:2000].copy()
+        forming.loc[1999, 'close'] = 1.0
+        state.update(forming, key="XLM/USDC")
+        for end in range(2010, 3001, 10):
+            self.assertLessEqual(state.update(candles.iloc[end - 1000:end], key="XLM/USDC"), 11)
+
+        np.testing.assert_array_equal(state.columns['close'][-1000:], candles['close'].to_numpy()[-1000:])
+        expected = downsample_ohlc(state.columns, state.width)
+        for name, values in expected.items():
+            np.testing.assert_array_equal(state.buckets[name], values)
+        # Only whole buckets older than the 1000 candle window were dropped
+        self.assertLess(len(state) - 1000, state.width)
+
+    def test_shrinking_window_narrows_buckets(self):
+        candles = make_candles("2024-01-01", 50000)
+        state = ChartState()
+        state.update(candles, key="XLM/USDC")
+        self.assertEqual(state.width, 64)
+
+        state.update(candles.iloc[-50:], key="XLM/USDC")
+        self.assertEqual(state.width, 1)
+        self.assertEqual(len(state), 50)
+        self.assertEqual(len(state.figure("candlestick").data[0].x), 50)
+
+    def test_figures_are_updated_in_place(self):
+        candles = make_candles("2024-01-01", 50000)
+        state = ChartState()
+        state.update(candles.iloc[:-5], key="XLM/USDC")
+        candle_figure = state.figure("candlestick", {"height": 300})
+        line_figure = state.figure("line")
+
+        started = time.perf_counter()
+        state.update(candles.iloc[5:], key="XLM/USDC")
+        self.assertIs(state.figure("candlestick"), candle_figure)
+        self.assertIs(state.figure("line"), line_figure)
+        elapsed = time.perf_counter() - started
+
+        self.assertLess(elapsed, 0.5)
+        self.assertEqual(candle_figure.layout.height, 300)
+        self.assertLessEqual(len(candle_figure.data[0].x), 800)
+        self.assertLessEqual(len(line_figure.data[0].x), 1600)
+        self.assertEqual(candle_figure.data[0].close[-1], candles['close'].iloc[-1])
+        self.assertEqual(len(candle_figure.data[1].x) + len(candle_figure.data[2].x), len(candle_figure.data[0].x))
+
+        state.update(candles.iloc[:100], key="AQUA/XLM")
+        self.assertIsNot(state.figure("candlestick"), candle_figure)
+        self.assertEqual(len(state.figure("line").data[0].x), 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+import os
+import time
+import tempfile
+import unittest
+import unittest.mock
+import numpy as np
+import pandas as pd
+from engine.journal import EventJournal, list_segments, read_events, replay_journal, reproduce_decision
+from engine.simulator import PaperTradingBot, replay
+from engine.strategies import TradingStrategy
+
+
+class TestEventJournal(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = self.tmp_dir.name
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_append_and_reopen_continues_numbering(self):
+        with EventJournal(self.path) as journal:
+            self.assertEqual(journal.append("signal", pair="XLM/USDC", signal="Buy"), 1)
+            self.assertEqual(journal.append("fill", price=np.float64(0.5), amount=np.int64(3)), 2)
+
+        with EventJournal(self.path) as journal:
+            self.assertEqual(journal.append("signal", pair="XLM/USDC", signal="Sell"), 3)
+
+        events = list(read_events(self.path))
+        self.assertEqual([event['seq'] for event in events], [1, 2, 3])
+        self.assertEqual(events[1]['amount'], 3)
+        self.assertEqual([event['signal'] for event in read_events(self.path, event_types=["signal"])], ["Buy", "Sell"])
+
+    def test_torn_event_is_truncated_on_open(self):
+        with EventJournal(self.path) as journal:
+            for i in range(10):
+                journal.append("candles", pair="XLM/USDC", timestamp=[i])
+        _, segment = list_segments(self.path)[-1]
+        with open(segment, 'ab') as file:
+            file.write(b'{"seq":11,"time":1.0,"type":"fi')
+
+        # A reader skips the partial line and a writer cuts it off
+        self.assertEqual(len(list(read_events(self.path))), 10)
+        with EventJournal(self.path) as journal:
+            self.assertEqual(journal.seq, 10)
+            journal.append("fill", price=1.0)
+        self.assertEqual([event['seq'] for event in read_events(self.path)][-2:], [10, 11])
+
+    def test_segments_are_skipped_by_sequence_number(self):
+        with EventJournal(self.path, segment_bytes=4096) as journal:
+            for i in range(1000):
+                journal.append("signal" if i % 10 == 0 else "candles", index=i)
+
+        self.assertGreater(len(list_segments(self.path)), 5)
+        self.assertEqual([event['index'] for event in read_events(self.path, start_seq=991)], list(range(990, 1000)))
+        self.assertEqual([event['seq'] for event in read_events(self.path, start_seq=500, end_seq=502)], [500, 501, 502])
+        self.assertEqual(len(list(read_events(self.path, event_types=["signal"]))), 100)
+
+    def test_fsync_is_batched(self):
+        with unittest.mock.patch('engine.journal.os.fsync') as fsync:
+            with EventJournal(self.path, fsync_every=100, fsync_interval=3600) as journal:
+                for i in range(1000):
+                    journal.append("candles", index=i)
+                self.assertEqual(fsync.call_count, 10)
+        self.assertEqual(len(list(read_events(self.path))), 1000)
+
+    def test_events_reach_the_os_and_orders_the_disk_immediately(self):
+        with unittest.mock.patch('engine.journal.os.fsync') as fsync:
+            journal = EventJournal(self.path, fsync_every=256, fsync_interval=3600)
+            journal.append("candles", index=0)
+            journal.append("signal", index=1)
+            self.assertEqual(fsync.call_count, 0)
+            # Readers (and a process dying without close) see every appended event
+            self.assertEqual(len(list(read_events(self.path))), 2)
+
+            journal.append("order", amount=1.0)
+            journal.append("submit", order=3, successful=False)
+            self.assertEqual(fsync.call_count, 2)
+            journal.close()
+
+    def test_interval_fsync_runs_without_further_appends(self):
+        with unittest.mock.patch('engine.journal.os.fsync') as fsync:
+            with EventJournal(self.path, fsync_every=256, fsync_interval=0.05) as journal:
+                journal.append("candles", index=0)
+                deadline = time.monotonic() + 5
+                while fsync.call_count == 0 and time.monotonic() < deadline:
+                    time.sleep(0.01)
+                self.assertEqual(fsync.call_count, 1)
+
+    def test_replays_a_million_events_quickly(self):
+        # Only replay is timed; fsyncing 250k submit events would just slow down the setup
+        with unittest.mock.patch('engine.journal.os.fsync'), EventJournal(self.path) as journal:
+            for i in range(250_000):
+                journal.append("fill", Offer=i % 7, Sold=1.5, Bought=2.5, Price=0.1)
+                journal.append("signal", pair="XLM/USDC", signal="Buy" if i % 2 else "Sell", price=0.1, amount=10.0, buy=None)
+                journal.append("order", base="XLM", counter="USDC", amount=10.0, price=0.1, buy=True)
+                journal.append("submit", order=journal.seq, successful=True)
+
+        started = time.perf_counter()
+        state = replay_journal(self.path)
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(state.events, 1_000_000)
+        self.assertEqual(len(state.orders), 250_000)
+        self.assertEqual(state.pending_orders, [])
+        self.assertLess(elapsed, 15, f"replayed {state.events} events in {elapsed:.2f}s")
+
+
+class TestJournaledReplay(unittest.TestCase):
+
+    def test_paper_trading_decisions_are_reproducible(self):
+        rng = np.random.default_rng(1)
+        timestamps = pd.date_range("2024-01-01", periods=1800, freq="10s", tz="UTC")
+        prices = np.exp(np.cumsum(rng.normal(0, 0.002, len(timestamps))))
+        trade_df = pd.DataFrame({'timestamp': timestamps, 'price': prices, 'volume': rng.uniform(1, 50, len(timestamps))})
+
+        with tempfile.TemporaryDirectory() as path:
+            with EventJournal(path) as journal:
+                bot = PaperTradingBot({"XLM": 10000, "USDC": 10000}, journal=journal)
+                replay(bot, trade_df, "XLM/USDC", TradingStrategy("Mean Reversion"), interval="1min", num_points=50)
+
+            state = replay_journal(path)
+            self.assertEqual(len(state.orders), len(bot.history) + len(bot.rejected))
+            self.assertEqual(len(state.fills), len(bot.fills))
+            self.assertEqual(state.pending_orders, [])
+            self.assertEqual(state.signals["XLM/USDC"]['balances'][0]['Asset'], "XLM")
+
+            signals = [event['seq'] for event in read_events(path, event_types=["signal"])]
+            self.assertEqual(len(signals), 300)
+            for signal_seq in signals[::25]:
+                self.assertTrue(reproduce_decision(path, signal_seq)['matches'])
+
+            # Decisions are recomputed with the definition they were made with, not the current one
+            edited = {"Mean Reversion": {"indicators": {}, "rules": [], "default": "Sell"}}
+            with unittest.mock.patch('engine.strategies.config', {'strategies': edited}):
+                self.assertTrue(reproduce_decision(path, signals[0])['matches'])
+
+            with self.assertRaises(ValueError):
+                reproduce_decision(path, 1)
+            self.assertTrue(os.listdir(path))
+
+
+if __name__ == '__main__':
+    unittest.main()
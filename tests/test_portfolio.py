@@ -0,0 +1,160 @@
+import time
+import threading
+import unittest
+import unittest.mock
+from stellar_sdk import Account, Keypair
+from engine.portfolio import Portfolio
+
+REQUEST_DELAY = 0.2
+
+
+class FakeCall:
+    def __init__(self, server, kind):
+        self.server = server
+        self.kind = kind
+        self.account = None
+
+    def account_id(self, account_id):
+        self.account = account_id
+        return self
+
+    def for_account(self, account_id):
+        self.account = account_id
+        return self
+
+    def limit(self, limit):
+        return self
+
+    def order(self, desc=True):
+        return self
+
+    def call(self):
+        with self.server.lock:
+            self.server.calls.append((self.kind, self.account))
+        time.sleep(REQUEST_DELAY)
+        if self.account == self.server.broken:
+            raise ConnectionError("connection reset")
+        index = self.server.public_keys.index(self.account)
+        if self.kind == 'accounts':
+            return {'balances': [
+                {'asset_type': 'native', 'balance': str(100.0 * (index + 1))},
+                {'asset_type': 'credit_alphanum4', 'asset_code': 'USDC', 'asset_issuer': 'ISSUER', 'balance': '10.0'},
+            ]}
+        if self.kind == 'offers':
+            return {'_embedded': {'records': [{
+                'id': str(index), 'selling': {'asset_type': 'native'},
+                'buying': {'asset_code': 'USDC', 'asset_issuer': 'ISSUER'}, 'amount': '5.0', 'price': '0.1',
+            }]}}
+        return {'_embedded': {'records': [{
+            'type': 'manage_sell_offer', 'created_at': '2024-01-01T00:00:00Z',
+            'selling_asset_code': 'USDC', 'amount': '2.0', 'price': '10.0',
+        }, {'type': 'payment', 'created_at': '2024-01-01T00:00:00Z'}]}}
+
+
+class FakeServer:
+    def __init__(self, public_keys):
+        self.public_keys = public_keys
+        self.calls = []
+        self.lock = threading.Lock()
+        self.broken = None
+
+    def load_account(self, account_id):
+        with self.lock:
+            self.calls.append(('load', account_id))
+        time.sleep(REQUEST_DELAY)
+        return account_id
+
+    def accounts(self):
+        return FakeCall(self, 'accounts')
+
+    def offers(self):
+        return FakeCall(self, 'offers')
+
+    def operations(self):
+        return FakeCall(self, 'operations')
+
+
+class TestPortfolio(unittest.TestCase):
+
+    def setUp(self):
+        self.keypairs = [Keypair.random() for _ in range(6)]
+        self.server = FakeServer([keypair.public_key for keypair in self.keypairs])
+        # Balances are listed for the assets pinned on the portfolio's network (testnet)
+        config_patch = unittest.mock.patch('engine.asset_registry.config', {'testnet_asset_issuers': {'USDC': 'ISSUER'}})
+        config_patch.start()
+        self.addCleanup(config_patch.stop)
+        with unittest.mock.patch('engine.portfolio.stellar_sdk.Server', return_value=self.server) as server_class:
+            self.portfolio = Portfolio([keypair.secret for keypair in self.keypairs], max_workers=8)
+        self.server_class = server_class
+
+    def test_accounts_share_one_pooled_server(self):
+        self.server_class.assert_called_once()
+        self.assertEqual(self.server_class.call_args.kwargs['client'].pool_size, 8)
+        self.assertTrue(all(bot.server is self.server for bot in self.portfolio.bots.values()))
+        self.assertTrue(all(bot.account is None for bot in self.portfolio.bots.values()))
+        self.assertEqual(self.server.calls, [])
+
+    def test_load_is_concurrent(self):
+        started = time.perf_counter()
+        self.portfolio.load()
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(len(self.server.calls), 6)
+        self.assertLess(elapsed, 3 * REQUEST_DELAY)
+        self.assertEqual({bot.account for bot in self.portfolio.bots.values()}, set(self.server.public_keys))
+
+    def test_snapshot_fetches_all_accounts_concurrently(self):
+        started = time.perf_counter()
+        snapshot = self.portfolio.snapshot()
+        elapsed = time.perf_counter() - started
+
+        # 18 requests of REQUEST_DELAY each on 8 workers
+        self.assertEqual(len(self.server.calls), 18)
+        self.assertLess(elapsed, 6 * REQUEST_DELAY)
+        self.assertEqual(len(snapshot['balances']), 12)
+        self.assertEqual(list(snapshot['offers'].columns), ["Account", "Offer", "Sell", "Buy", "Amount", "Price"])
+        self.assertEqual(len(snapshot['offers']), 6)
+        self.assertEqual(len(snapshot['history']), 6)
+        self.assertEqual(snapshot['history']['Total'].iloc[0], 20.0)
+
+    def test_aggregate_balances(self):
+        view = self.portfolio.aggregate_balances(self.portfolio.snapshot()['balances'])
+
+        self.assertEqual(list(view['Asset']), ["XLM", "USDC"])
+        self.assertEqual(view.set_index('Asset').loc['XLM', 'Total'], 2100.0)
+        self.assertEqual(view.set_index('Asset').loc['USDC', 'Total'], 60.0)
+        self.assertEqual(len(view.columns), 2 + len(self.keypairs))
+
+    def test_failing_account_does_not_break_the_others(self):
+        self.server.broken = self.keypairs[0].public_key
+        snapshot = self.portfolio.snapshot()
+
+        self.assertEqual(snapshot['balances']['Account'].nunique(), 5)
+        self.assertEqual(len(snapshot['offers']), 5)
+        self.assertEqual(self.portfolio.aggregate_balances(snapshot['balances']).set_index('Asset').loc['XLM', 'Total'], 2000.0)
+
+
+class TestOrderRecovery(unittest.TestCase):
+
+    def test_failed_submit_reloads_the_sequence_number(self):
+        keypair, issuer = Keypair.random(), Keypair.random().public_key
+        server = unittest.mock.Mock()
+        server.load_account.side_effect = lambda account_id: Account(account_id, 100)
+        server.submit_transaction.side_effect = ConnectionError("timeout")
+        portfolio = Portfolio([keypair.secret], network="testnet")
+        bot = next(iter(portfolio.bots.values()))
+        bot.server = server
+        bot.load_account()
+
+        # The rejected transaction consumed sequence 101 locally only
+        self.assertIsNone(bot.place_order("XLM", "USDC", 10, 0.1, counter_issuer=issuer))
+        self.assertEqual(server.load_account.call_count, 2)
+        self.assertEqual(bot.account.sequence, 100)
+
+        # Unpinned issuers are refused before anything is signed
+        self.assertIsNone(bot.place_order("XLM", "AQUA", 10, 0.1))
+        self.assertEqual(server.submit_transaction.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
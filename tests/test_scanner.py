@@ -0,0 +1,65 @@
+import unittest
+import unittest.mock
+import numpy as np
+import pandas as pd
+from engine.scanner import MarketScanner, invert_trades
+from engine.strategies import TradingStrategy, evaluate_latest, strategy_names
+
+
+def make_candles(close):
+    return pd.DataFrame({
+        'timestamp': pd.date_range("2024-01-01", periods=len(close), freq="1min", tz="UTC"),
+        'open': close, 'high': close, 'low': close, 'close': close, 'volume': np.ones(len(close)),
+    })
+
+
+class TestScanner(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.series = [np.exp(np.cumsum(rng.normal(0, 0.01, length))) for length in (60, 60, 55, 30, 10)]
+        self.series[1][-7] = np.nan
+
+    def test_evaluate_latest_matches_trading_strategy(self):
+        close = np.full((len(self.series), 60), np.nan)
+        for row, values in enumerate(self.series):
+            close[row, -len(values):] = values
+
+        for strategy_name in strategy_names:
+            signals, _ = evaluate_latest(strategy_name, close)
+            expected = [TradingStrategy(strategy_name).apply(make_candles(values))['Signal'].iloc[-1] for values in self.series]
+            self.assertEqual(list(signals), expected, strategy_name)
+
+    def test_invert_trades(self):
+        trade_df = pd.DataFrame({'timestamp': [pd.Timestamp("2024-01-01", tz="UTC")], 'price': [0.1], 'amount': [50.0], 'volume': [50.0]})
+        inverted = invert_trades(trade_df)
+        self.assertAlmostEqual(inverted['price'].iloc[0], 10)
+        self.assertAlmostEqual(inverted['volume'].iloc[0], 5)
+
+    def test_scan_fetches_each_pair_once_and_ranks(self):
+        scanner = MarketScanner(assets=["XLM", "USDC", "VELO", "SHX"], num_points=60)
+
+        def fake_fetch_trades(server, base_asset, counter_asset, start_time, rate_limiter=None):
+            self.assertIs(rate_limiter, scanner.rate_limiter)
+            now = pd.Timestamp.now(tz="UTC").floor("1min")
+            prices = np.linspace(1, 2, 60) if base_asset.is_native() else np.ones(60)
+            return [{'timestamp': now - pd.Timedelta(minutes=59 - i), 'price': price, 'amount': 1.0, 'volume': 1.0}
+                    for i, price in enumerate(prices)]
+
+        with unittest.mock.patch('engine.scanner.fetch_trades', side_effect=fake_fetch_trades) as mock_fetch:
+            table = scanner.scan()
+
+        self.assertEqual(mock_fetch.call_count, 6)
+        self.assertEqual(set(table['Pair']), set(scanner.pairs()))
+        self.assertEqual(len(table), 12 * len(strategy_names))
+        # XLM pairs trend, so they carry the strongest signals; flat pairs have none
+        self.assertTrue(table.iloc[0]['Pair'].startswith("XLM/") or table.iloc[0]['Pair'].endswith("/XLM"))
+        actionable = table[table['Signal'] != 'Hold']
+        self.assertEqual(list(table.index[:len(actionable)]), list(actionable.index))
+        self.assertTrue(actionable['Strength'].is_monotonic_decreasing)
+        flat = table[table['Pair'] == "USDC/VELO"]
+        self.assertTrue((flat['Strength'] == 0).all())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import time
+import unittest
+import numpy as np
+import pandas as pd
+from engine.simulator import PaperTradingBot, replay
+from engine.strategies import TradingStrategy
+
+
+class TestPaperTradingBot(unittest.TestCase):
+
+    def setUp(self):
+        self.bot = PaperTradingBot({"XLM": 1000, "USDC": 100})
+        self.now = pd.Timestamp("2024-01-01", tz="UTC")
+
+    def trade(self, prices, volumes):
+        timestamps = pd.date_range(self.now, periods=len(prices), freq="1s")
+        self.bot.match_trades("XLM", "USDC", timestamps, np.array(prices), np.array(volumes))
+
+    def test_buy_offer_fills_partially_then_fully(self):
+        # Buy 50 USDC paying at most 10 XLM each, i.e. a market price of at least 0.1 USDC per XLM
+        response = self.bot.place_order("XLM", "USDC", amount=50, price=10, buy=True)
+        self.assertTrue(response['successful'])
+        self.assertAlmostEqual(self.bot.balances["XLM"], 1000 - 0.001)
+
+        self.trade([0.05, 0.1], [1000, 200])  # Only the second trade crosses: 20 USDC
+        self.assertAlmostEqual(self.bot.offers[response['offer_id']]['remaining'], 30)
+        self.assertAlmostEqual(self.bot.balances["USDC"], 120)
+
+        self.trade([0.2], [1000])
+        self.assertEqual(self.bot.offers, {})
+        self.assertAlmostEqual(self.bot.balances["USDC"], 150)
+        self.assertAlmostEqual(self.bot.balances["XLM"], 1000 - 0.001 - 500)
+        self.assertEqual(len(self.bot.fills_frame()), 2)
+
+    def test_offers_share_trade_volume_in_price_time_priority(self):
+        first = self.bot.place_order("XLM", "USDC", amount=15, price=10, buy=True)
+        better = self.bot.place_order("XLM", "USDC", amount=15, price=12, buy=True)
+        last = self.bot.place_order("XLM", "USDC", amount=15, price=10, buy=True)
+
+        self.trade([0.1], [200])  # 20 USDC for all three offers
+        self.assertNotIn(better['offer_id'], self.bot.offers)
+        self.assertAlmostEqual(self.bot.offers[first['offer_id']]['remaining'], 10)
+        self.assertAlmostEqual(self.bot.offers[last['offer_id']]['remaining'], 15)
+        self.assertAlmostEqual(self.bot.balances["USDC"], 120)
+        self.assertEqual(list(self.bot.fills_frame()['Offer']), [better['offer_id'], first['offer_id']])
+
+    def test_sell_offer_and_fee_rate(self):
+        bot = PaperTradingBot({"XLM": 10, "USDC": 100}, fee_rate=0.01)
+        bot.place_order("XLM", "USDC", amount=10, price=5, buy=False)
+        bot.match_trades("XLM", "USDC", pd.date_range(self.now, periods=1, freq="1s"), np.array([0.1]), np.array([1000]))
+        self.assertAlmostEqual(bot.balances["USDC"], 90)
+        self.assertAlmostEqual(bot.balances["XLM"], 10 - 0.001 + 50 * 0.99)
+
+    def test_underfunded_offer_is_rejected(self):
+        self.assertIsNone(self.bot.place_order("XLM", "USDC", amount=200, price=1, buy=False))
+        self.bot.place_order("XLM", "USDC", amount=80, price=1, buy=False)
+        # The resting offer reserves 80 USDC, leaving only 20 to sell
+        self.assertIsNone(self.bot.place_order("XLM", "USDC", amount=30, price=1, buy=False))
+        self.assertEqual(len(self.bot.fetch_trading_history()), 1)
+        self.assertEqual([rejection['Result'] for rejection in self.bot.rejected], ["op_underfunded", "op_underfunded"])
+
+    def test_offer_crosses_order_book_on_submit(self):
+        self.bot.set_order_book(bids=[(0.1, 100), (0.12, 100)], asks=[(0.13, 100)])
+        self.bot.place_order("XLM", "USDC", amount=20, price=10, buy=True)
+        # Best bid 0.12 USDC/XLM provides 12 USDC, then 8 more come from the 0.1 level
+        self.assertEqual(self.bot.offers, {})
+        self.assertAlmostEqual(self.bot.balances["USDC"], 120)
+        self.assertAlmostEqual(self.bot.balances["XLM"], 1000 - 0.001 - 100 - 80)
+
+
+class TestReplay(unittest.TestCase):
+
+    def test_replays_a_day_quickly(self):
+        rng = np.random.default_rng(0)
+        timestamps = pd.date_range("2024-01-01", "2024-01-02", freq="10s", tz="UTC", inclusive="left")
+        prices = np.exp(np.cumsum(rng.normal(0, 0.002, len(timestamps))))
+        trade_df = pd.DataFrame({'timestamp': timestamps, 'price': prices, 'volume': rng.uniform(1, 50, len(timestamps))})
+
+        bot = PaperTradingBot({"XLM": 10000, "USDC": 10000})
+        started = time.perf_counter()
+        snapshots = replay(bot, trade_df, "XLM/USDC", TradingStrategy("Mean Reversion"), interval="1min", num_points=50)
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(len(snapshots), 1440)
+        self.assertGreater(len(bot.fetch_trading_history()), 0)
+        self.assertGreater(len(bot.fills), 0)
+        self.assertLess(elapsed, 30)
+
+
+if __name__ == '__main__':
+    unittest.main()
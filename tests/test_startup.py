@@ -0,0 +1,91 @@
+import os
+import sys
+import json
+import tempfile
+import unittest
+import subprocess
+from engine.config import Config
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENGINE_MODULES = [
+    "engine.cli", "engine.config", "engine.stellar_api", "engine.trading_bot", "engine.strategies",
+    "engine.backfill", "engine.candle_archive", "engine.simulator", "engine.scanner", "engine.asset_registry", "engine.portfolio", "engine.charts", "engine.journal",
+]
+HEAVY_MODULES = ["pandas", "numpy", "stellar_sdk", "requests", "yaml", "pyarrow", "plotly"]
+
+
+def measure_import(modules, runs=3):
+    """
+    Import modules in fresh interpreters and return the fastest import time and the heavy
+    modules they pulled in.
+    """
+    script = (
+        "import sys, time, json\n"
+        "started = time.perf_counter()\n"
+        f"for name in {modules!r}: __import__(name)\n"
+        "elapsed = time.perf_counter() - started\n"
+        f"print(json.dumps([elapsed, [m for m in {HEAVY_MODULES!r} if m in sys.modules]]))\n"
+    )
+    results = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", script], cwd=REPO_ROOT, capture_output=True, text=True, check=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return min(elapsed for elapsed, _ in results), results[0][1]
+
+
+class TestStartup(unittest.TestCase):
+
+    def test_engine_imports_defer_heavy_dependencies(self):
+        _, loaded = measure_import(ENGINE_MODULES, runs=1)
+        self.assertEqual(loaded, [])
+
+    def test_import_time_benchmark(self):
+        engine_time, _ = measure_import(ENGINE_MODULES)
+        eager_time, _ = measure_import(["pandas", "numpy", "stellar_sdk"])
+        # Importing the whole engine must cost a small fraction of importing its dependencies
+        self.assertLess(engine_time, eager_time / 4,
+                        f"engine import: {engine_time * 1000:.1f} ms, eager dependencies: {eager_time * 1000:.1f} ms")
+
+    def test_cli_help_does_not_import_commands(self):
+        result = subprocess.run(
+            [sys.executable, "-c", "import sys, runpy\n"
+                                   "sys.argv = ['engine', '--help']\n"
+                                   "try:\n    runpy.run_module('engine', run_name='__main__')\n"
+                                   "except SystemExit:\n    pass\n"
+                                   f"print([m for m in {HEAVY_MODULES!r} + ['engine.backfill', 'engine.scanner'] if m in sys.modules])"],
+            cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+        )
+        self.assertIn("backfill", result.stdout)
+        self.assertEqual(result.stdout.strip().splitlines()[-1], "[]")
+
+
+class TestConfig(unittest.TestCase):
+
+    def test_config_is_loaded_lazily_and_reloadable(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".yaml", delete=False) as file:
+            file.write("asset_issuers:\n  XLM: native\n")
+        try:
+            config = Config(file.name)
+            self.assertIsNone(config._data)
+            self.assertEqual(config.asset_issuers, {"XLM": "native"})
+            self.assertIn('asset_issuers', config)
+
+            with open(file.name, "w") as rewritten:
+                rewritten.write("asset_issuers:\n  USDC: issuer\n")
+            self.assertEqual(config['asset_issuers'], {"XLM": "native"})
+            config.reload()
+            self.assertEqual(config.get('asset_issuers'), {"USDC": "issuer"})
+        finally:
+            os.remove(file.name)
+
+    def test_default_config_does_not_depend_on_working_directory(self):
+        previous = os.getcwd()
+        os.chdir(tempfile.gettempdir())
+        try:
+            self.assertIn("XLM", Config().asset_issuers)
+        finally:
+            os.chdir(previous)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import unittest
+import unittest.mock
+import numpy as np
+import pandas as pd
+from engine.strategies import (
+    TradingStrategy, compile_strategies, evaluate_strategies, parameter_grid, list_strategies, strategy_names
+)
+
+
+def make_candles(close):
+    return pd.DataFrame({
+        'timestamp': pd.date_range("2024-01-01", periods=len(close), freq="1min", tz="UTC"),
+        'open': close, 'high': close * 1.01, 'low': close * 0.99, 'close': close, 'volume': np.ones(len(close)),
+    })
+
+
+def pandas_signals(strategy_name, price_df, window=20, short_window=20, long_window=50, z_threshold=1.5):
+    # The per-strategy pandas formulas the definitions replace
+    close = price_df['close']
+    if strategy_name == "Moving Average":
+        return np.where(close > close.rolling(window).mean(), 'Sell', 'Buy')
+    if strategy_name == "Moving Average Crossover":
+        return np.where(close.rolling(short_window).mean() > close.rolling(long_window).mean(), 'Buy', 'Sell')
+    z_score = (close - close.rolling(window).mean()) / close.rolling(window).std()
+    return np.where(z_score > z_threshold, 'Sell', np.where(z_score < -z_threshold, 'Buy', 'Hold'))
+
+
+class TestStrategies(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        self.close = np.exp(np.cumsum(rng.normal(0, 0.01, 300)))
+        self.close[120] = np.nan
+
+    def test_apply_matches_pandas_formulas(self):
+        for strategy_name in strategy_names:
+            price_df = TradingStrategy(strategy_name).apply(make_candles(self.close))
+            np.testing.assert_array_equal(price_df['Signal'].to_numpy(), pandas_signals(strategy_name, make_candles(self.close)))
+
+        price_df = TradingStrategy("Mean Reversion").apply(make_candles(self.close))
+        expected = make_candles(self.close)['close'].rolling(20).std()
+        np.testing.assert_allclose(price_df['Rolling_Std'], expected, rtol=1e-9)
+        self.assertEqual(list(price_df.columns[-4:]), ['Rolling_Mean', 'Rolling_Std', 'Z_Score', 'Signal'])
+
+    def test_apply_validates_columns(self):
+        with self.assertRaises(ValueError):
+            TradingStrategy("Moving Average").apply(make_candles(self.close).drop(columns=['close']))
+        with self.assertRaises(ValueError):
+            TradingStrategy("Unknown").apply(make_candles(self.close))
+
+    def test_shared_indicators_are_computed_once(self):
+        kernel = compile_strategies(strategy_names)
+        # The 20-candle SMA of the close is used by all three strategies
+        self.assertEqual(kernel.source.count("_sma(v0, 20)"), 1)
+        self.assertEqual(kernel.source.count("_std("), 1)
+        self.assertIs(compile_strategies(strategy_names), kernel)
+
+    def test_parameter_grid_in_one_pass(self):
+        variants = parameter_grid("Mean Reversion", window=[10, 20], z_threshold=[1.0, 2.0])
+        self.assertEqual(variants[0][0], "Mean Reversion(window=10, z_threshold=1.0)")
+        kernel = compile_strategies(variants)
+        self.assertEqual(kernel.source.count("_std("), 2)
+
+        results = kernel({'close': self.close})
+        price_df = make_candles(self.close)
+        for label, _, params in variants:
+            signal, strength, indicators = results[label]
+            expected = pandas_signals("Mean Reversion", price_df, **params)
+            np.testing.assert_array_equal(np.array(['Hold', 'Buy', 'Sell'])[signal], expected, label)
+            np.testing.assert_allclose(strength, np.abs(indicators['Z_Score']))
+
+    def test_many_series_at_once(self):
+        close = np.vstack([self.close[:200], self.close[100:]])
+        results = evaluate_strategies(strategy_names, close)
+        for strategy_name in strategy_names:
+            signals, _ = results[strategy_name]
+            expected = [pandas_signals(strategy_name, make_candles(values))[-1] for values in close]
+            self.assertEqual(list(signals), expected, strategy_name)
+
+    def test_many_series_read_every_candle_column(self):
+        definition = {
+            "indicators": {"Upper": "shift(highest(high, 10), 1)", "Lower": "shift(lowest(low, 10), 1)"},
+            "rules": [["close > Upper", "Buy"], ["close < Lower", "Sell"]],
+        }
+        price_df = TradingStrategy("Breakout", definition=definition).apply(make_candles(self.close))
+        candles = make_candles(self.close)
+        columns = {column: np.vstack([candles[column].to_numpy()[:200], candles[column].to_numpy()[-200:]]) for column in ('high', 'low', 'close')}
+
+        signals, _ = evaluate_strategies([("Breakout", definition, {})], columns)["Breakout"]
+        self.assertEqual(list(signals), [price_df['Signal'].iloc[199], price_df['Signal'].iloc[-1]])
+        with self.assertRaises(ValueError):
+            evaluate_strategies([("Breakout", definition, {})], columns['close'])
+
+    def test_strategies_from_config(self):
+        definitions = {
+            "Breakout": {
+                "params": {"window": 30},
+                "indicators": {"Upper": "shift(highest(high, window), 1)", "Lower": "shift(lowest(low, window), 1)"},
+                "rules": [["close > Upper", "Buy"], ["close < Lower", "Sell"]],
+                "default": "Hold",
+            }
+        }
+        with unittest.mock.patch('engine.strategies.config', {'strategies': definitions}):
+            self.assertEqual(list_strategies(), strategy_names + ["Breakout"])
+            price_df = TradingStrategy("Breakout", {"window": 10}).apply(make_candles(self.close))
+
+        upper = price_df['high'].rolling(10).max().shift(1)
+        lower = price_df['low'].rolling(10).min().shift(1)
+        expected = np.where(price_df['close'] > upper, 'Buy', np.where(price_df['close'] < lower, 'Sell', 'Hold'))
+        np.testing.assert_array_equal(price_df['Signal'].to_numpy(), expected)
+        np.testing.assert_allclose(price_df['Upper'], upper)
+
+    def test_invalid_definitions(self):
+        for expression in ["close.mean()", "__import__('os')", "sma(close, window2)", "sma(close, 2.5)", "close >"]:
+            with self.assertRaises(ValueError, msg=expression):
+                compile_strategies([("Bad", {"indicators": {"X": expression}, "rules": [["X > 0", "Buy"]]}, {"window": 5})])
+        with self.assertRaises(ValueError):
+            compile_strategies([("Bad", {"rules": [["close > 0", "Short"]]}, {})])
+
+
+if __name__ == '__main__':
+    unittest.main()